@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import glob
+import time
+from datetime import datetime
+
+from sqlite_store import SQLiteStore
+
+STORE_FILE = os.path.join(".cache", "analytics.sqlite")
+REPORTS_DIR = "exam_reports"
+SESSIONS_DIR = "sessions"
+BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+
+def parse_score(score):
+    # "3/5" -> (3, 5)
+    try:
+        s, t = str(score).split("/")
+        return int(s), int(t)
+    except ValueError:
+        return 0, 0
+
+
+def parse_time(value, default=None):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return default
+
+
+def day_of(ts):
+    # Local calendar day; time ranges resolve to whole days
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def topic_key(topic):
+    return " ".join(str(topic or "").lower().split())
+
+
+# ===============================
+# Analytics Store (SQLite)
+# ===============================
+class AnalyticsStore(SQLiteStore):
+    # `scores` keeps one row per (run, skill) with correct/total counts, plus
+    # a "*" row with the run's overall score; `daily` rolls them up per
+    # (day, kind, topic, skill) as they are written, so aggregates scan the
+    # rollup instead of every run. Exams store their skill breakdown; study
+    # quizzes use the skill "quiz".
+
+    tables = ("runs", "scores", "daily", "sources")
+
+    def __init__(self, path=STORE_FILE):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                source TEXT,
+                ts REAL NOT NULL,
+                topic TEXT NOT NULL,
+                mode TEXT,
+                correct INTEGER NOT NULL,
+                total INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_source ON runs(source);
+
+            CREATE TABLE IF NOT EXISTS scores (
+                run_id INTEGER NOT NULL,
+                ts REAL NOT NULL,
+                kind TEXT NOT NULL,
+                topic_key TEXT NOT NULL,
+                skill TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                total INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_scores_run ON scores(run_id);
+
+            CREATE TABLE IF NOT EXISTS daily (
+                day TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                topic_key TEXT NOT NULL,
+                skill TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                runs INTEGER NOT NULL,
+                PRIMARY KEY (topic_key, skill, kind, day)
+            );
+            CREATE INDEX IF NOT EXISTS idx_daily_day ON daily(day);
+            CREATE INDEX IF NOT EXISTS idx_daily_skill ON daily(skill, day);
+
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            );
+        """)
+
+    # ---------- writes ----------
+    def _roll_up(self, rows, sign=1):
+        # rows: (ts, kind, topic_key, skill, correct, total)
+        self._db.executemany(
+            "INSERT INTO daily (day, kind, topic_key, skill, correct, total, runs) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (topic_key, skill, kind, day) DO UPDATE SET "
+            "correct = correct + excluded.correct, total = total + excluded.total, runs = runs + excluded.runs",
+            [(day_of(ts), kind, key, skill, sign * c, sign * t, sign) for ts, kind, key, skill, c, t in rows],
+        )
+
+    def _insert_run(self, kind, source, ts, topic, mode, correct, total, skills):
+        cur = self._db.execute(
+            "INSERT INTO runs (kind, source, ts, topic, mode, correct, total) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, source, ts, topic, mode, correct, total),
+        )
+        rows = [(ts, kind, topic_key(topic), skill, c, t) for skill, c, t in skills + [("*", correct, total)]]
+        self._db.executemany(
+            "INSERT INTO scores (run_id, ts, kind, topic_key, skill, correct, total) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(cur.lastrowid,) + row for row in rows],
+        )
+        self._roll_up(rows)
+
+    def _replace_source(self, source):
+        # Re-ingesting a changed file replaces what it contributed before
+        if source is None:
+            return
+        ids = [(r[0],) for r in self._db.execute("SELECT id FROM runs WHERE source = ?", (source,))]
+        for (run_id,) in ids:
+            self._roll_up(self._db.execute(
+                "SELECT ts, kind, topic_key, skill, correct, total FROM scores WHERE run_id = ?", (run_id,)
+            ).fetchall(), sign=-1)
+        self._db.executemany("DELETE FROM scores WHERE run_id = ?", ids)
+        self._db.execute("DELETE FROM runs WHERE source = ?", (source,))
+        mtime = os.path.getmtime(source) if os.path.exists(source) else time.time()
+        self._db.execute("INSERT OR REPLACE INTO sources (path, mtime) VALUES (?, ?)", (source, mtime))
+
+    def record_exam(self, report, source=None):
+        # A day 8 exam report (as written by save_report)
+        correct, total = parse_score(report.get("score"))
+        skills = [(skill, s.get("correct", 0), s.get("total", 0))
+                  for skill, s in (report.get("skill_breakdown") or {}).items()]
+        with self._lock:
+            self._replace_source(source)
+            self._insert_run("exam", source, parse_time(report.get("created_at"), time.time()),
+                             report.get("topic", ""), report.get("mode"), correct, total, skills)
+            self._db.commit()
+
+    def record_session(self, session, source=None):
+        # A day 7 study session: one run per quiz taken
+        ts = parse_time(session.get("started_at"), time.time())
+        with self._lock:
+            self._replace_source(source)
+            for item in session.get("items", []):
+                if item.get("type") != "quiz_take":
+                    continue
+                correct, total = parse_score(item.get("score"))
+                self._insert_run("quiz", source, ts, item.get("topic", ""), None,
+                                 correct, total, [("quiz", correct, total)])
+            self._db.commit()
+
+    def ingest(self, reports_dir=REPORTS_DIR, sessions_dir=SESSIONS_DIR):
+        # Loads report/session files that are new or changed since the last
+        # ingest; returns the number of files read
+        with self._lock:
+            seen = dict(self._db.execute("SELECT path, mtime FROM sources"))
+
+        loaded = 0
+        for pattern, record in ((os.path.join(reports_dir, "*.json"), self.record_exam),
+                                (os.path.join(sessions_dir, "*.json"), self.record_session)):
+            for path in sorted(glob.glob(pattern)):
+                if seen.get(path, -1) >= os.path.getmtime(path):
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                record(data, source=path)
+                loaded += 1
+        return loaded
+
+    # ---------- queries ----------
+    def _where(self, per_skill, topic=None, skill=None, kind=None, since=None, until=None):
+        # Run-level totals live under the skill "*": per-skill queries skip
+        # them, everything else reads only them
+        if skill:
+            clauses, args = ["skill = ?"], [skill]
+        else:
+            clauses, args = ["skill != '*'" if per_skill else "skill = '*'"], []
+        for column, value in (("topic_key", topic_key(topic) if topic else None), ("kind", kind)):
+            if value:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("day >= ?")
+            args.append(day_of(since))
+        if until is not None:
+            clauses.append("day < ?")
+            args.append(day_of(until))
+        return " AND ".join(clauses), args
+
+    def _aggregate(self, group, per_skill=False, **filters):
+        where, args = self._where(per_skill, **filters)
+        with self._lock:
+            return self._db.execute(
+                f"SELECT {group}, SUM(correct), SUM(total), SUM(runs) FROM daily "
+                f"WHERE {where} GROUP BY 1 HAVING SUM(runs) > 0 ORDER BY 1",
+                args,
+            ).fetchall()
+
+    def skill_accuracy(self, **filters):
+        # [(skill, correct, total, runs)]
+        return self._aggregate("skill", per_skill=True, **filters)
+
+    def topic_accuracy(self, **filters):
+        # [(topic, correct, total, runs)]
+        return self._aggregate("topic_key", **filters)
+
+    def timeline(self, bucket="day", **filters):
+        # [(period, correct, total, runs)]
+        return self._aggregate(f"strftime('{BUCKETS[bucket]}', day)", **filters)
+
+
+def parse_filters(args):
+    # --topic T --skill S --kind exam|quiz --days N --since YYYY-MM-DD --until YYYY-MM-DD
+    opts = dict(zip(args[::2], args[1::2]))
+    filters = {"topic": opts.get("--topic"), "skill": opts.get("--skill"), "kind": opts.get("--kind")}
+    if "--days" in opts:
+        filters["since"] = time.time() - float(opts["--days"]) * 86400
+    if "--since" in opts:
+        filters["since"] = parse_time(opts["--since"])
+    if "--until" in opts:
+        filters["until"] = parse_time(opts["--until"])
+    return filters
+
+
+if __name__ == "__main__":
+    # python analytics_store.py ingest
+    # python analytics_store.py skills|topics [filters]
+    # python analytics_store.py timeline [day|week|month] [filters]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    store = AnalyticsStore()
+
+    if cmd == "ingest":
+        start = time.perf_counter()
+        loaded = store.ingest()
+        print(f"✅ Ingested {loaded} files in {time.perf_counter() - start:.2f}s ({len(store)} runs stored)")
+
+    elif cmd in ("skills", "topics", "timeline"):
+        args = sys.argv[2:]
+        bucket = "day"
+        if cmd == "timeline" and args and args[0] in BUCKETS:
+            bucket, args = args[0], args[1:]
+        filters = parse_filters(args)
+
+        start = time.perf_counter()
+        if cmd == "skills":
+            rows = store.skill_accuracy(**filters)
+        elif cmd == "topics":
+            rows = store.topic_accuracy(**filters)
+        else:
+            rows = store.timeline(bucket, **filters)
+        took = (time.perf_counter() - start) * 1000
+
+        for name, correct, total, runs in rows:
+            rate = correct / total if total else 0.0
+            print(f"- {name}: {correct}/{total} ({rate:.0%}) over {runs} runs")
+        print(f"⏱️ {len(rows)} rows in {took:.1f} ms")
+
+    else:
+        print("Usage: python analytics_store.py ingest")
+        print("       python analytics_store.py skills|topics [--topic T] [--skill S] [--kind exam|quiz]")
+        print("                                  [--days N] [--since YYYY-MM-DD] [--until YYYY-MM-DD]")
+        print("       python analytics_store.py timeline [day|week|month] [filters]")
+        sys.exit(1)
@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import numpy as np
+
+from vector_store import normalize_rows, top_k_indices
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+ROWS_FILE = "ivf_rows.npy"
+LIST_OFFSETS_FILE = "ivf_offsets.npy"
+
+DEFAULT_NPROBE = 8
+TRAIN_POINTS_PER_LIST = 64
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def default_nlist(n):
+    # Rule of thumb: ~4 * sqrt(N) lists, at least 1
+    return max(1, min(n, int(4 * np.sqrt(n))))
+
+
+# ===============================
+# Spherical k-means (coarse quantizer)
+# ===============================
+def assign_to_centroids(matrix, centroids):
+    assign = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], ASSIGN_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def train_centroids(matrix, nlist, iters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+
+    # Train on a sample; assignment of every row happens afterwards
+    sample_size = min(n, nlist * TRAIN_POINTS_PER_LIST)
+    rows = np.sort(rng.choice(n, sample_size, replace=False))
+    data = np.asarray(matrix[rows], dtype=np.float32)
+
+    centroids = data[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=nlist)
+
+        order = np.argsort(assign, kind="stable")
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(data[order], starts, axis=0)
+
+        # Re-seed empty lists with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(sample_size, len(empty))]
+
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+# ===============================
+# IVF Index
+# ===============================
+class IVFIndex:
+
+    kind = "ivf"
+
+    def __init__(self, centroids, rows, offsets, nprobe=DEFAULT_NPROBE):
+        self.centroids = centroids
+        self.rows = rows
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, matrix, nlist=None, iters=20, seed=0, nprobe=DEFAULT_NPROBE):
+        nlist = min(nlist or default_nlist(matrix.shape[0]), matrix.shape[0])
+        centroids = train_centroids(matrix, nlist, iters=iters, seed=seed)
+
+        assign = assign_to_centroids(matrix, centroids)
+        rows = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist)))).astype(np.int64)
+        return cls(centroids, rows, offsets, nprobe=nprobe)
+
+    def search(self, matrix, queries, k, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = top_k_indices(queries @ self.centroids.T, nprobe)
+
+        results = []
+        for q, lists in zip(queries, probes):
+            parts = [self.rows[self.offsets[c]:self.offsets[c + 1]] for c in lists]
+            rows = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+            if len(rows) == 0:
+                results.append((rows, np.empty(0, dtype=np.float32)))
+                continue
+
+            # Sorted row order keeps memory-mapped reads sequential
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ q
+            top = top_k_indices(scores, k)
+            results.append((rows[top], scores[top]))
+
+        return results
+
+    def save(self, path):
+        np.save(os.path.join(path, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, ROWS_FILE), self.rows)
+        np.save(os.path.join(path, LIST_OFFSETS_FILE), self.offsets)
+        return {"type": self.kind, "nlist": self.nlist, "nprobe": self.nprobe}
+
+    @classmethod
+    def load(cls, path, info):
+        return cls(
+            np.load(os.path.join(path, CENTROIDS_FILE)),
+            np.load(os.path.join(path, ROWS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, LIST_OFFSETS_FILE)),
+            nprobe=info.get("nprobe", DEFAULT_NPROBE),
+        )
+
+
+ANN_TYPES = {"ivf": IVFIndex}
+
+
+def load_ann(path, meta):
+    info = meta.get("ann")
+    if not info:
+        return None
+    return ANN_TYPES[info["type"]].load(path, info)
+
+
+# ===============================
+# Recall Check
+# ===============================
+def sample_queries(engine, n=100, noise=0.05, seed=0):
+    # Perturbed copies of indexed vectors stand in for real questions
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(engine), min(n, len(engine)), replace=False)
+    base = np.asarray(engine.matrix[np.sort(rows)], dtype=np.float32)
+    return normalize_rows(base + rng.normal(scale=noise, size=base.shape).astype(np.float32))
+
+
+def recall_at_k(engine, queries, k=10, nprobe=None):
+    exact = engine.search_batch(queries, k=k, exact=True)
+
+    start = time.perf_counter()
+    approx = engine.search_batch(queries, k=k, nprobe=nprobe)
+    elapsed = time.perf_counter() - start
+
+    found = 0
+    for e, a in zip(exact, approx):
+        found += len({cid for _, cid, _ in e} & {cid for _, cid, _ in a})
+
+    total = sum(len(e) for e in exact)
+    return {
+        "k": k,
+        "nprobe": nprobe or engine.ann.nprobe,
+        "recall": round(found / total, 4) if total else 1.0,
+        "ms_per_query": round(1000 * elapsed / max(len(queries), 1), 3),
+    }
+
+
+if __name__ == "__main__":
+    # python ann_index.py recall rag_index [k] [nprobe,nprobe,...]
+    from index_store import open_index_dir
+
+    if len(sys.argv) < 3 or sys.argv[1] != "recall":
+        print("Usage: python ann_index.py recall <index_dir> [k] [nprobe,...]")
+        sys.exit(1)
+
+    engine = open_index_dir(sys.argv[2])
+    if engine is None or engine.ann is None:
+        print("❌ Index has no ANN structure (set ANN_TYPE and rebuild).")
+        sys.exit(1)
+
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    probes = [int(p) for p in sys.argv[4].split(",")] if len(sys.argv) > 4 else [1, 2, 4, 8, 16, 32]
+    queries = sample_queries(engine)
+
+    print(f"IVF nlist={engine.ann.nlist}, {len(engine)} vectors, {len(queries)} queries")
+    for p in probes:
+        r = recall_at_k(engine, queries, k=k, nprobe=p)
+        print(f"- nprobe={r['nprobe']:<4} recall@{k}={r['recall']:.3f}  {r['ms_per_query']} ms/query")
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import numpy as np
+
+from vector_store import normalize_rows
+from llm_metrics import metrics
+from sqlite_store import SQLiteStore
+
+CACHE_FILE = os.path.join(".cache", "answers.sqlite")
+SIMILARITY_THRESHOLD = 0.95
+TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+
+
+def chunk_key(chunk_ids):
+    return ",".join(str(c) for c in sorted(chunk_ids))
+
+
+# ===============================
+# Semantic Answer Cache (SQLite)
+# ===============================
+class AnswerCache(SQLiteStore):
+    # A cached answer is reused when the new question embedding is close
+    # enough AND the same chunks were retrieved from the same index version.
+
+    tables = ("answers",)
+    key_column = "id"
+
+    def __init__(self, path=CACHE_FILE, threshold=SIMILARITY_THRESHOLD,
+                 ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                index_version TEXT NOT NULL,
+                chunk_key TEXT NOT NULL,
+                vec BLOB NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_answers_key ON answers(index_version, chunk_key);
+            CREATE INDEX IF NOT EXISTS idx_answers_used ON answers(last_used);
+        """)
+
+    def lookup(self, question_vec, chunk_ids, index_version):
+        q = normalize_rows(np.asarray(question_vec, dtype=np.float32))
+        cutoff = time.time() - self.ttl
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, vec, question, answer FROM answers "
+                "WHERE index_version = ? AND chunk_key = ? AND created >= ?",
+                (index_version, chunk_key(chunk_ids), cutoff),
+            ).fetchall()
+
+            best = None
+            if rows:
+                vecs = np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+                sims = vecs @ q
+                i = int(np.argmax(sims))
+                if sims[i] >= self.threshold:
+                    best = {"question": rows[i][2], "answer": rows[i][3], "similarity": float(sims[i])}
+                    self._db.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), rows[i][0]))
+                    self._db.commit()
+
+        if best is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        metrics.record_cache("answers", hits=int(best is not None), misses=int(best is None))
+        return best
+
+    def store(self, question_vec, chunk_ids, index_version, question, answer):
+        vec = normalize_rows(np.asarray(question_vec, dtype=np.float32))
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers (index_version, chunk_key, vec, question, answer, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (index_version, chunk_key(chunk_ids), vec.tobytes(), question, answer, now, now),
+            )
+            self._evict(self.max_entries, self.ttl, now)
+            self._db.commit()
+
+    def invalidate_other_versions(self, index_version):
+        # Called after (re)building the index: old answers cite old chunks
+        with self._lock:
+            cur = self._db.execute("DELETE FROM answers WHERE index_version != ?", (index_version,))
+            self._db.commit()
+            return cur.rowcount
+
+    def stats(self):
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+if __name__ == "__main__":
+    # python answer_cache.py [stats|clear]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = AnswerCache()
+
+    if cmd == "clear":
+        cache.clear()
+        print("Answer cache cleared ✅")
+    else:
+        print(f"💬 {cache.path}: {len(cache)} cached answers")
@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import math
+from array import array
+from collections import Counter
+import numpy as np
+
+from vector_store import top_k_indices
+
+VOCAB_FILE = "bm25_vocab.json"
+TERM_OFFSETS_FILE = "bm25_term_offsets.npy"
+DOC_IDS_FILE = "bm25_doc_ids.npy"
+TFS_FILE = "bm25_tfs.npy"
+DOC_LENS_FILE = "bm25_doc_lens.npy"
+
+K1 = 1.5
+B = 0.75
+RRF_K = 60
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# ===============================
+# BM25 Inverted Index
+# ===============================
+class BM25Index:
+    # Postings are stored CSR-style: for term t, its documents are
+    # doc_ids[term_offsets[t]:term_offsets[t + 1]] with matching tfs.
+
+    def __init__(self, vocab, term_offsets, doc_ids, tfs, doc_lens, k1=K1, b=B):
+        self.vocab = vocab if isinstance(vocab, dict) else {t: i for i, t in enumerate(vocab)}
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self.avgdl = max(float(np.mean(doc_lens)), 1.0) if len(doc_lens) else 1.0
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    @classmethod
+    def build(cls, texts):
+        vocab = {}
+        term_ids, doc_ids, tfs = array("i"), array("i"), array("H")
+        doc_lens = array("i")
+
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc)
+                tfs.append(min(tf, 65535))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")  # keeps docs ascending per term
+        counts = np.bincount(term_ids, minlength=len(vocab))
+
+        return cls(
+            vocab,
+            np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            np.frombuffer(doc_ids, dtype=np.int32)[order],
+            np.frombuffer(tfs, dtype=np.uint16)[order],
+            np.frombuffer(doc_lens, dtype=np.int32).copy(),
+        )
+
+    def scores(self, query):
+        n = len(self)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0:
+            return scores
+
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+
+            lo, hi = self.term_offsets[t], self.term_offsets[t + 1]
+            docs = self.doc_ids[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[docs] / self.avgdl)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return scores
+
+    def search(self, query, k):
+        # Returns (rows, scores), best first; rows with score 0 are dropped
+        scores = self.scores(query)
+        top = top_k_indices(scores, k)
+        top = top[scores[top] > 0]
+        return top, scores[top]
+
+    def save(self, path):
+        with open(os.path.join(path, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.vocab, key=self.vocab.get), f, ensure_ascii=False)
+        np.save(os.path.join(path, TERM_OFFSETS_FILE), self.term_offsets)
+        np.save(os.path.join(path, DOC_IDS_FILE), self.doc_ids)
+        np.save(os.path.join(path, TFS_FILE), self.tfs)
+        np.save(os.path.join(path, DOC_LENS_FILE), self.doc_lens)
+        return {"k1": self.k1, "b": self.b, "terms": len(self.vocab), "postings": int(len(self.doc_ids))}
+
+    @classmethod
+    def load(cls, path, info):
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        mode = "r" if info.get("postings") else None
+        return cls(
+            vocab,
+            np.load(os.path.join(path, TERM_OFFSETS_FILE)),
+            np.load(os.path.join(path, DOC_IDS_FILE), mmap_mode=mode),
+            np.load(os.path.join(path, TFS_FILE), mmap_mode=mode),
+            np.load(os.path.join(path, DOC_LENS_FILE)),
+            k1=info.get("k1", K1),
+            b=info.get("b", B),
+        )
+
+
+def load_bm25(path, meta):
+    info = meta.get("bm25")
+    if not info:
+        return None
+    return BM25Index.load(path, info)
+
+
+# ===============================
+# Reciprocal Rank Fusion
+# ===============================
+def rrf_fuse(rankings, k, rrf_k=RRF_K):
+    # rankings: lists of row numbers, best first
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+    best = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:k]
+    return [row for row, _ in best], [score for _, score in best]
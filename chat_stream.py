@@ -0,0 +1,45 @@
+import time
+
+
+def print_token(token):
+    print(token, end="", flush=True)
+
+
+# ===============================
+# Streaming Chat Completion
+# ===============================
+def stream_chat(client, on_token=print_token, stream=True, **request):
+    # Returns (text, stats). Tokens are passed to on_token as they arrive;
+    # clients without streaming support get a single on_token call.
+    start = time.perf_counter()
+    resp = client.chat.completions.create(stream=True, **request) if stream else \
+        client.chat.completions.create(**request)
+
+    # Non-streaming fallback (stream=False or a stub that ignores it)
+    if hasattr(resp, "choices"):
+        text = resp.choices[0].message.content or ""
+        elapsed = time.perf_counter() - start
+        if on_token and text:
+            on_token(text)
+        return text, {"streamed": False, "ttft": elapsed, "total": elapsed}
+
+    parts = []
+    ttft = None
+    for chunk in resp:
+        if not chunk.choices:
+            continue
+
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(delta)
+            if on_token:
+                on_token(delta)
+
+    total = time.perf_counter() - start
+    return "".join(parts), {"streamed": True, "ttft": ttft if ttft is not None else total, "total": total}
+
+
+def format_timing(stats):
+    return f"⏱️ first token {stats['ttft'] * 1000:.0f} ms · total {stats['total'] * 1000:.0f} ms"
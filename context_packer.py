@@ -0,0 +1,105 @@
+from token_count import count_tokens, count_message_tokens
+
+MESSAGE_OVERHEAD = 4       # framing tokens per chat message
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+MIN_OVERLAP = 20           # shortest shared text treated as window overlap
+
+
+# ===============================
+# Overlap Removal
+# ===============================
+def shared_overlap(a, b, max_len):
+    # Length of the longest suffix of a that is also a prefix of b
+    for n in range(min(len(a), len(b), max_len), MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def dedupe_chunks(chunks, max_overlap=400):
+    # chunk_text windows overlap: drop chunks fully contained in an already
+    # picked one and trim text shared with a picked neighbour.
+    picked = []
+    for score, cid, text in chunks:
+        if any(text in t for _, _, t in picked):
+            continue
+
+        for _, _, prev in picked:
+            n = shared_overlap(prev, text, max_overlap)
+            if n:
+                text = text[n:]
+            n = shared_overlap(text, prev, max_overlap)
+            if n:
+                text = text[:-n]
+
+        if text.strip():
+            picked.append((score, cid, text))
+    return picked
+
+
+# ===============================
+# Greedy Packing
+# ===============================
+def take_history(history, cap, model=None):
+    # Newest messages that fit in `cap` tokens, starting on a user turn
+    kept = []
+    used = 0
+    for msg in reversed(history):
+        t = MESSAGE_OVERHEAD + count_tokens(msg["content"] or "", model)
+        if used + t > cap:
+            break
+        kept.insert(0, msg)
+        used += t
+
+    # Keep whole user/assistant pairs so the model never sees half a turn
+    if kept and kept[0]["role"] == "assistant":
+        used -= MESSAGE_OVERHEAD + count_tokens(kept[0]["content"] or "", model)
+        kept = kept[1:]
+    return kept, used
+
+
+def pack_context(question, chunks, history, budget, fixed_messages=(), model=None,
+                 history_share=0.35, separator=CONTEXT_SEPARATOR):
+    # Fills `budget` prompt tokens: fixed messages + question first, then the
+    # highest-scoring chunks, then the most recent history turns.
+    fixed_tokens = count_message_tokens(list(fixed_messages), model)
+    question_tokens = MESSAGE_OVERHEAD + count_tokens(question, model)
+    remaining = budget - fixed_tokens - question_tokens - MESSAGE_OVERHEAD  # context message
+
+    # History first gets its share; chunks get the rest; leftover goes
+    # back to history so neither side starves the other.
+    kept_history, history_tokens = take_history(history, int(max(remaining, 0) * history_share), model)
+
+    chunk_room = remaining - history_tokens
+    kept_chunks = []
+    chunk_tokens = 0
+    sep_tokens = count_tokens(separator, model)
+    for score, cid, text in dedupe_chunks(sorted(chunks, key=lambda c: c[0], reverse=True)):
+        t = count_tokens(text, model) + (sep_tokens if kept_chunks else 0)
+        if chunk_tokens + t > chunk_room:
+            continue
+        kept_chunks.append((score, cid, text))
+        chunk_tokens += t
+
+    kept_history, history_tokens = take_history(history, remaining - chunk_tokens, model)
+
+    report = {
+        "budget": budget,
+        "fixed": fixed_tokens,
+        "question": question_tokens,
+        "chunks": chunk_tokens,
+        "chunks_used": len(kept_chunks),
+        "chunk_ids": [cid for _, cid, _ in kept_chunks],
+        "chunks_offered": len(chunks),
+        "history": history_tokens,
+        "history_messages": len(kept_history),
+        "total": fixed_tokens + question_tokens + MESSAGE_OVERHEAD + chunk_tokens + history_tokens,
+    }
+    return kept_chunks, kept_history, report
+
+
+def format_budget(report):
+    return (f"🧮 prompt {report['total']}/{report['budget']} tokens · "
+            f"chunks {report['chunks']} ({report['chunks_used']}/{report['chunks_offered']}) · "
+            f"history {report['history']} ({report['history_messages']} msgs) · "
+            f"system+question {report['fixed'] + report['question']}")
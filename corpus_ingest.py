@@ -0,0 +1,249 @@
+import os
+import codecs
+import hashlib
+import fnmatch
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from index_store import (
+    IndexWriter, open_index_dir, close_index, update_meta, load_chunk_hashes, chunk_hash, file_sha256,
+)
+from text_chunker import iter_file_chunks
+
+DEFAULT_INCLUDE = ["*.txt", "*.md", "*.json"]
+DEFAULT_EXCLUDE = [".*", "__pycache__", "*.tmp", "*.old", "rag_index*", "requirements.txt"]
+WORKERS = os.cpu_count() or 2
+STREAM_BYTES = 4 << 20   # bigger files are chunked in this process, streaming
+
+
+# ===============================
+# Find Files
+# ===============================
+def matches(name, patterns):
+    return any(fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def find_files(paths, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE):
+    found = set()
+
+    for root in paths:
+        if os.path.isfile(root):
+            found.add(os.path.relpath(root))
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not matches(d, exclude))
+            for name in filenames:
+                rel = os.path.relpath(os.path.join(dirpath, name))
+                if matches(name, include) and not (matches(name, exclude) or matches(rel, exclude)):
+                    found.add(rel)
+
+    return sorted(found)
+
+
+def stat_entry(path):
+    st = os.stat(path)
+    return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def iter_file_rows(path, settings):
+    # (start, text, hash) per chunk, one chunk in memory at a time
+    for start, text in iter_file_chunks(
+        path,
+        settings["chunk_size"],
+        settings["overlap"],
+        boundary=settings["boundary"],
+        unit=settings["unit"],
+        model=settings["embed_model"],
+    ):
+        yield start, text, chunk_hash(text)
+
+
+def text_file_sha256(path, block_size=1 << 20):
+    # (sha256, is_utf8) in one constant-memory pass
+    h = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    ok = True
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+            if ok:
+                try:
+                    decoder.decode(block)
+                except UnicodeDecodeError:
+                    ok = False
+    if ok:
+        try:
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            ok = False
+    return h.hexdigest(), ok
+
+
+def stream_file(path, settings):
+    # Large files: chunked lazily in the parent so memory is bounded by the
+    # embedding batch, not the file size (a pool worker would have to
+    # return every chunk at once)
+    sha, ok = text_file_sha256(path)
+    if not ok:
+        print(f"⚠️ Skipped (not UTF-8 text): {path}")
+        return sha, iter(())
+    return sha, iter_file_rows(path, settings)
+
+
+# ===============================
+# Worker (runs in a child process)
+# ===============================
+def chunk_file(path, settings):
+    # Small files only: the whole chunk list is pickled back to the parent
+    try:
+        chunks = list(iter_file_rows(path, settings))
+    except UnicodeDecodeError:
+        print(f"⚠️ Skipped (not UTF-8 text): {path}")
+        chunks = []
+    return file_sha256(path), chunks
+
+
+def ordered_map(pool, fn, items, window):
+    # Like pool.map, but only `window` results are ever buffered
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# ===============================
+# Incremental Corpus Index
+# ===============================
+def plan_files(index, files, settings):
+    # Returns (entries, reuse) where reuse[i] is the old file number whose
+    # chunks can be copied unchanged, or None if the file must be chunked.
+    old_files = {}
+    if index is not None and index.meta.get("settings") == settings and index.sources is not None:
+        old_files = {f["path"]: (i, f) for i, f in enumerate(index.meta.get("files", []))}
+
+    entries, reuse = [], []
+    for path in files:
+        entry = stat_entry(path)
+        old_i, old = old_files.get(path, (None, None))
+
+        if old and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+            entry["sha256"] = old["sha256"]
+        elif old and old["size"] == entry["size"] and file_sha256(path) == old["sha256"]:
+            # Touched but unchanged
+            entry["sha256"] = old["sha256"]
+        else:
+            old_i = None
+
+        entries.append(entry)
+        reuse.append(old_i)
+
+    return entries, reuse
+
+
+def update_corpus_index(index, paths, index_dir, settings, embed_iter, dtype="float32",
+                        include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, workers=WORKERS):
+    files = find_files(paths, include, exclude)
+    entries, reuse = plan_files(index, files, settings)
+    old_paths = [f["path"] for f in index.meta.get("files", [])] if index is not None else []
+
+    unchanged = index is not None and all(r is not None for r in reuse) and old_paths == files
+    if unchanged:
+        if index.meta and entries != index.meta.get("files"):
+            update_meta(index_dir, {"files": entries})
+            return open_index_dir(index_dir), None
+        return index, None
+
+    # Fingerprint -> old row, so moved or duplicated chunks keep their vectors
+    known = {}
+    old_hashes = []
+    if index is not None and len(index) and index.meta.get("embed_model") in (None, settings["embed_model"]):
+        old_hashes = load_chunk_hashes(index_dir) if index.meta else None
+        if old_hashes is None:
+            old_hashes = [chunk_hash(t) for t in index.texts]
+        for row, h in enumerate(old_hashes):
+            known.setdefault(h, row)
+
+    to_chunk = [(f, settings) for f, r in zip(files, reuse) if r is None]
+    streamed = {f for f, e, r in zip(files, entries, reuse) if r is None and e["size"] > STREAM_BYTES}
+    pooled = [item for item in to_chunk if item[0] not in streamed]
+    counts = {"files_chunked": len(to_chunk), "reused": 0, "embedded": 0}
+    pending = deque()
+    seen = set()
+
+    def iter_rows(pool):
+        chunked = ordered_map(pool, chunk_file, pooled, window=max(workers, 1) * 2) if pool else \
+            (chunk_file(*item) for item in pooled)
+
+        for file_idx, old_i in enumerate(reuse):
+            if old_i is not None:
+                for row in index.sources.rows_of(old_i):
+                    yield file_idx, int(index.sources.starts[row]), index.texts[row], old_hashes[row], row
+                continue
+
+            if files[file_idx] in streamed:
+                sha, chunks = stream_file(files[file_idx], settings)
+            else:
+                sha, chunks = next(chunked)
+            entries[file_idx]["sha256"] = sha
+            for start, text, h in chunks:
+                yield file_idx, start, text, h, known.get(h)
+
+    def texts_to_embed(pool):
+        for item in iter_rows(pool):
+            seen.add(item[3])
+            pending.append(item)
+            if item[4] is None:
+                yield item[2]
+
+    def flush_known(writer):
+        while pending and pending[0][4] is not None:
+            file_idx, start, text, h, row = pending.popleft()
+            writer.add(len(writer), text, index.matrix[row], h, source=file_idx, start=start)
+            counts["reused"] += 1
+
+    # One file does not justify the start-up cost of a process pool
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(pooled) > 1 else None
+    writer = IndexWriter(index_dir, dtype=dtype)
+    try:
+        for vec in embed_iter(texts_to_embed(pool)):
+            flush_known(writer)
+            file_idx, start, text, h, _ = pending.popleft()
+            writer.add(len(writer), text, vec, h, source=file_idx, start=start)
+            counts["embedded"] += 1
+        flush_known(writer)
+    except Exception:
+        writer.abort()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Every reused row is already copied into the writer; let go of the
+    # old files so the directory swap also works on Windows
+    if index is not None:
+        close_index(index)
+    writer.close({"embed_model": settings["embed_model"], "settings": settings, "files": entries})
+    counts["dropped"] = len(set(known) - seen)
+    return open_index_dir(index_dir), counts
+
+
+if __name__ == "__main__":
+    # python corpus_ingest.py notes.txt outputs sessions --include "*.txt" "*.json"
+    import day9_rag_engine as rag
+
+    parser = argparse.ArgumentParser(description="Index files and directories for day9_rag_engine")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--include", nargs="+", default=DEFAULT_INCLUDE)
+    parser.add_argument("--exclude", nargs="+", default=DEFAULT_EXCLUDE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    index = rag.load_index()
+    index = rag.update_index(index, args.paths, include=args.include,
+                             exclude=args.exclude, workers=args.workers)
+    print(f"📚 {len(index.meta.get('files', []))} files, {len(index)} chunks in {rag.INDEX_DIR}")
@@ -1,7 +1,5 @@
-import os
-from openai import OpenAI
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_client import ask
+from llm_metrics import traced, print_summary
 
 name1 = "Ahmed"
 name2 = "Mohamed"
@@ -15,15 +13,9 @@ Always give:
 3) 1-line exercise
 """
 
+@traced()
 def ask_ai(q: str) -> str:
-    r = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": q},
-        ],
-    )
-    return r.choices[0].message.content
+    return ask(system_prompt, q, model="gpt-4o-mini")
 
 print("Day 2 Chat Ready ✅ (type 'exit' to stop)\n")
 
@@ -31,5 +23,6 @@ while True:
     q = input("You: ").strip()
     if q.lower() in ("exit", "quit"):
         print("Bye 👋")
+        print_summary()
         break
     print("\nAI:\n", ask_ai(q), "\n")
@@ -1,7 +1,5 @@
-import os
-from openai import OpenAI
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_client import ask
+from llm_metrics import traced, print_summary
 
 # ===== Prompt engineering rules =====
 SYSTEM_PROMPT = """
@@ -14,16 +12,9 @@ Rules:
 - End with ONE short exercise
 """
 
+@traced()
 def ask_ai(topic: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Teach this topic: {topic}"}
-        ],
-        max_tokens=200
-    )
-    return response.choices[0].message.content
+    return ask(SYSTEM_PROMPT, f"Teach this topic: {topic}", model="gpt-4o-mini", max_tokens=200)
 
 print("Day 3 – Prompt Engineering Ready ✅")
 print("Type a topic (or 'exit')\n")
@@ -32,6 +23,7 @@ while True:
     topic = input("Topic: ").strip()
     if topic.lower() in ("exit", "quit"):
         print("Good work today 👋")
+        print_summary()
         break
 
     print("\nAI Response:\n")
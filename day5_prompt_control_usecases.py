@@ -1,7 +1,5 @@
-import os
-from openai import OpenAI
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_client import ask
+from llm_metrics import traced, print_summary
 
 SYSTEM_PROMPT = """
 Explains like you are 12
@@ -17,16 +15,9 @@ Rules:
 - If asked for a table, return a markdown table
 """
 
+@traced()
 def ask_ai(user_task: str) -> str:
-    r = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_task},
-        ],
-        max_tokens=300,
-    )
-    return r.choices[0].message.content
+    return ask(SYSTEM_PROMPT, user_task, model="gpt-4o-mini", max_tokens=300)
 
 print("Day 5 Ready ✅ (type 'exit' to stop)\n")
 
@@ -34,6 +25,7 @@ while True:
     task = input("Task: ").strip()
     if task.lower() in ("exit", "quit"):
         print("Nice work today 👋")
+        print_summary()
         break
     print("\nAI:\n")
     print(ask_ai(task))
@@ -0,0 +1,188 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from llm_client import get_client, RateLimiter
+from llm_metrics import metrics, print_summary
+from map_reduce import map_reduce, needs_map_reduce
+from day6_mini_project import INSTRUCTIONS, ask_ai
+
+OUT_DIR = os.path.join("outputs", "batch")
+RESULTS_FILE = "results.jsonl"
+WORKERS = 8
+ACTIONS = {"summarize": "1", "keypoints": "2", "tone": "3"}
+
+
+# ===============================
+# Inputs
+# ===============================
+def list_files(source):
+    # A glob ("docs/**/*.txt") or @manifest.txt with one path per line
+    if source.startswith("@"):
+        with open(source[1:], "r", encoding="utf-8") as f:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in dict.fromkeys(paths) if os.path.isfile(p))
+
+
+def resolve_instruction(action):
+    # "summarize" / "keypoints" / "tone", the menu number 1-3, or any
+    # other text as a custom instruction
+    return INSTRUCTIONS.get(ACTIONS.get(action, action), action)
+
+
+def file_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def output_name(path, instruction):
+    # Unique per input path and instruction, readable at a glance
+    base = os.path.splitext(os.path.basename(path))[0]
+    tag = hashlib.sha1(f"{os.path.abspath(path)}\0{instruction}".encode("utf-8")).hexdigest()[:8]
+    return f"{base}.{tag}.txt"
+
+
+# ===============================
+# Outputs (safe from many workers)
+# ===============================
+class BatchOutput:
+    # Per-file results are written to a temp file and renamed into place;
+    # results.jsonl gets one line per file under a lock. A file counts as
+    # done when its line says "ok" for the same content and instruction,
+    # so a re-run skips it.
+
+    def __init__(self, out_dir=OUT_DIR):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.results_path = os.path.join(out_dir, RESULTS_FILE)
+        self._lock = threading.Lock()
+        self.done = self._load_done()
+        self._results = open(self.results_path, "a", encoding="utf-8")
+
+    def _load_done(self):
+        done = set()
+        if os.path.exists(self.results_path):
+            with open(self.results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut off by a crash
+                    if r.get("status") == "ok":
+                        done.add((r["path"], r["sha256"], r["instruction"]))
+        return done
+
+    def is_done(self, path, sha, instruction):
+        return (path, sha, instruction) in self.done
+
+    def write(self, record, result=None):
+        if result is not None:
+            target = os.path.join(self.out_dir, output_name(record["path"], record["instruction"]))
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(result)
+            os.replace(tmp, target)
+            record["output"] = target
+
+        line = json.dumps(dict(record, result=result), ensure_ascii=False) + "\n"
+        with self._lock:
+            self._results.write(line)
+            self._results.flush()
+            if record.get("status") == "ok":
+                self.done.add((record["path"], record["sha256"], record["instruction"]))
+
+    def close(self):
+        self._results.close()
+
+
+# ===============================
+# Batch Run
+# ===============================
+def process_file(path, instruction, output):
+    start = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    sha = file_hash(text)
+    if output.is_done(path, sha, instruction):
+        return "skipped"
+
+    record = {"path": path, "sha256": sha, "instruction": instruction, "ts": round(time.time(), 3)}
+    try:
+        if needs_map_reduce(text):
+            # One map worker per file: the batch pool is the concurrency bound
+            result, _stats = map_reduce(instruction, text, workers=1)
+        else:
+            result = ask_ai(instruction, text)
+    except Exception as e:
+        output.write(dict(record, status="error", error=f"{type(e).__name__}: {e}",
+                          seconds=round(time.perf_counter() - start, 2)))
+        return "error"
+
+    output.write(dict(record, status="ok", seconds=round(time.perf_counter() - start, 2)), result)
+    return "ok"
+
+
+def total_tokens():
+    totals = metrics.totals()
+    return totals["prompt_tokens"] + totals["completion_tokens"]
+
+
+def run_batch(source, action, out_dir=OUT_DIR, workers=WORKERS):
+    files = list_files(source)
+    instruction = resolve_instruction(action)
+    output = BatchOutput(out_dir)
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+
+    print(f"📂 {len(files)} files · {workers} workers · {instruction}")
+    start = time.perf_counter()
+    tokens_before = total_tokens()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(contextvars.copy_context().run, process_file, path, instruction, output): path
+                       for path in files}
+            for i, fut in enumerate(as_completed(futures), 1):
+                try:
+                    status = fut.result()
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"⚠️ {futures[fut]}: {e}")
+                    status = "error"
+                counts[status] += 1
+                if i % 50 == 0 or i == len(files):
+                    print(f"… {i}/{len(files)} ({counts['ok']} done, {counts['skipped']} skipped, "
+                          f"{counts['error']} failed)")
+    finally:
+        output.close()
+
+    minutes = (time.perf_counter() - start) / 60
+    tokens = total_tokens() - tokens_before
+    processed = counts["ok"] + counts["error"]
+    print(f"\n✅ {counts['ok']} processed · {counts['skipped']} already done · {counts['error']} failed")
+    if minutes > 0:
+        print(f"⏱️ {minutes:.1f} min · {processed / minutes:.1f} files/min · {tokens / minutes:,.0f} tokens/min")
+    print(f"📄 Results: {output.results_path}")
+    return counts
+
+
+if __name__ == "__main__":
+    # python day6_batch.py "<glob>|@manifest.txt" <summarize|keypoints|tone|"custom instruction">
+    #                      [--out DIR] [--workers N] [--rpm N] [--tpm N]
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print('Usage: python day6_batch.py "<glob>|@manifest.txt" <summarize|keypoints|tone|"instruction">')
+        print("                            [--out DIR] [--workers N] [--rpm N] [--tpm N]")
+        sys.exit(1)
+
+    opts = dict(zip(args[2::2], args[3::2]))
+    if "--rpm" in opts or "--tpm" in opts:
+        get_client().limiter = RateLimiter(int(opts.get("--rpm", 0)), int(opts.get("--tpm", 0)))
+
+    run_batch(args[0], args[1], opts.get("--out", OUT_DIR), int(opts.get("--workers", WORKERS)))
+    print_summary()
@@ -1,7 +1,7 @@
 import os
-from openai import OpenAI
-
-client = OpenAI()
+from llm_client import ask
+from llm_metrics import traced, print_summary
+from map_reduce import map_reduce, needs_map_reduce
 
 # ----------------------------
 # 1️⃣ Read File
@@ -31,16 +31,17 @@ def get_user_choice():
 # ----------------------------
 # 3️⃣ Build Prompt
 # ----------------------------
-def build_prompt(choice, text):
+INSTRUCTIONS = {
+    "1": "Summarize the following text:",
+    "2": "Extract the key points from the following text:",
+    "3": "Analyze the tone of the following text:",
+}
 
-    if choice == "1":
-        return "Summarize the following text:", text
 
-    elif choice == "2":
-        return "Extract the key points from the following text:", text
+def build_prompt(choice, text):
 
-    elif choice == "3":
-        return "Analyze the tone of the following text:", text
+    if choice in INSTRUCTIONS:
+        return INSTRUCTIONS[choice], text
 
     elif choice == "4":
         custom = input("Enter your custom instruction: ")
@@ -54,17 +55,10 @@ def build_prompt(choice, text):
 # ----------------------------
 # 4️⃣ Ask AI
 # ----------------------------
+@traced()
 def ask_ai(system_instruction, user_text):
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_instruction},
-            {"role": "user", "content": user_text}
-        ]
-    )
-
-    return response.choices[0].message.content
+    return ask(system_instruction, user_text, model="gpt-4o-mini")
 
 
 # ----------------------------
@@ -99,12 +93,19 @@ def main():
 
     print("\n⏳ Processing...\n")
 
-    result = ask_ai(system_instruction, user_text)
+    # Files too big for one request go through map-reduce over chunks
+    if needs_map_reduce(user_text):
+        result, stats = map_reduce(system_instruction, user_text)
+        print(f"🧩 {stats['chunks']} chunks · {stats['levels']} reduce levels · "
+              f"{stats['requests']} requests ({stats['cached']} cached)")
+    else:
+        result = ask_ai(system_instruction, user_text)
 
     print("\n✅ Result:\n")
     print(result)
 
     save_output(result)
+    print_summary()
 
 
 # ----------------------------
@@ -1,24 +1,41 @@
-import os
-from openai import OpenAI
+from llm_client import get_client, chat
+from llm_metrics import traced, print_summary
+from chat_stream import stream_chat, print_token, format_timing
+from history_log import HistoryLog
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
+
+HISTORY_FILE = "day7_chat_history.jsonl"
+HISTORY_LOAD_LAST = 20
+STREAM_ANSWERS = True   # print tokens as they arrive
+history_log = HistoryLog(HISTORY_FILE)
 
 def create_chat(system_prompt: str):
     return [{"role": "system", "content": system_prompt}]
 
+@traced()
 def chat_with_ai(messages, user_input):
     messages.append({"role": "user", "content": user_input})
 
-    response = client.chat.completions.create(
+    ai_reply = chat(messages, model="gpt-4o-mini", max_tokens=300)
+    messages.append({"role": "assistant", "content": ai_reply})
+
+    return ai_reply
+
+@traced()
+def stream_chat_with_ai(messages, user_input, on_token=print_token):
+    messages.append({"role": "user", "content": user_input})
+
+    ai_reply, timing = stream_chat(
+        client,
+        on_token=on_token,
         model="gpt-4o-mini",
         messages=messages,
         max_tokens=300
     )
-
-    ai_reply = response.choices[0].message.content
     messages.append({"role": "assistant", "content": ai_reply})
 
-    return ai_reply
+    return ai_reply, timing
 
 def main():
     print("🤖 Day 7 Smart Chat Assistant")
@@ -34,21 +51,33 @@ Be honest about knowledge limits.
 """
 
     messages = create_chat(system_prompt)
+    restored = history_log.load(last_n=HISTORY_LOAD_LAST)
+    messages.extend(restored)
+    if restored:
+        print(f"↩️ Restored {len(restored)} messages from {HISTORY_FILE}\n")
 
     while True:
         user_input = input("You: ")
 
         if user_input.lower() == "exit":
+            print_summary()
             print("Goodbye, Ha det bra 👋 !!")
             break
 
         if user_input.lower() == "reset":
             messages = create_chat(system_prompt)
+            history_log.reset()
             print("🔄 Conversation reset!\n")
             continue
 
-        reply = chat_with_ai(messages, user_input)
-        print("AI:", reply, "\n")
+        if STREAM_ANSWERS:
+            print("AI: ", end="")
+            reply, timing = stream_chat_with_ai(messages, user_input)
+            print(f"\n{format_timing(timing)}\n")
+        else:
+            reply = chat_with_ai(messages, user_input)
+            print(f"AI: {reply}\n")
+        history_log.append(messages[-2], messages[-1])
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,10 @@
 import json
 import os
 from datetime import datetime
-from openai import OpenAI
+from llm_client import ask
+from llm_metrics import traced, print_summary
+from analytics_store import AnalyticsStore
 
-client = OpenAI()
 MODEL = "gpt-4o-mini"
 
 
@@ -13,19 +14,13 @@ def save_session(session, folder="sessions"):
     path = os.path.join(folder, f"study_session_{ts}.json")
     with open(path, "w", encoding="utf-8") as f:
         json.dump(session, f, ensure_ascii=False, indent=2)
+    AnalyticsStore().record_session(session, source=path)
     return path
 
 
+@traced()
 def ask_ai(system_prompt, user_prompt):
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=500,
-    )
-    return resp.choices[0].message.content
+    return ask(system_prompt, user_prompt, model=MODEL, max_tokens=500)
 
 
 def print_stats(session):
@@ -126,6 +121,7 @@ Return ONLY valid JSON like this:
 
         elif choice == "4":
             print_stats(session)
+            print_summary()
             path = save_session(session)
             print(f"✅ Session saved to: {path}\nGoodbye 👋")
             break
@@ -1,10 +1,17 @@
 import json
 import os
 import time
+import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
+from llm_client import ask
+from llm_metrics import traced, print_summary
+from analytics_store import AnalyticsStore
+from startup import LazyObject, run_in_background
+
+bank = LazyObject("question_bank", "QuestionBank")
 
-client = OpenAI()
 MODEL = "gpt-4o-mini"
 
 # ===============================
@@ -16,28 +23,42 @@ def save_report(report, folder="exam_reports"):
     path = os.path.join(folder, f"exam_report_{ts}.json")
     with open(path, "w", encoding="utf-8") as f:
         json.dump(report, f, ensure_ascii=False, indent=2)
+    AnalyticsStore().record_exam(report, source=path)
     return path
 
 
 # ===============================
 # OpenAI Call
 # ===============================
-def ask_ai(system_prompt, user_prompt, max_tokens=900):
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=max_tokens,
-    )
-    return resp.choices[0].message.content
+@traced()
+def ask_ai(system_prompt, user_prompt, max_tokens=900, cache=True):
+    return ask(system_prompt, user_prompt, model=MODEL, max_tokens=max_tokens, cache=cache)
 
 
 # ===============================
 # Generate Exam
 # ===============================
+SKILLS = ["concepts", "definitions", "examples", "problem_solving"]
+PARALLEL_GENERATION = True   # shard big exams into concurrent requests
+SHARD_SIZE = 5               # questions per generation request
+GEN_WORKERS = 16             # shard requests in flight
+SHARD_ATTEMPTS = 3           # rounds of regenerating failed / short shards
+DUPLICATE_SIMILARITY = 0.9   # word-set Jaccard at which questions count as repeats
+TOKENS_PER_QUESTION = {"mcq": 120, "short": 80, "essay": 250}
+DIFFICULTIES = ("easy", "medium", "hard")
+USE_QUESTION_BANK = True     # sample from the bank before generating live
+BANK_REFILL = True           # top the bank up in the background during the exam
+ESSAY_GRADERS = 4            # essays graded concurrently while the exam goes on
+
+
+@traced()
 def generate_exam(topic: str, n: int, mcq_ratio: float):
+    if PARALLEL_GENERATION and n > SHARD_SIZE:
+        return generate_exam_sharded(topic, n, mcq_ratio)
+    return generate_exam_single(topic, n, mcq_ratio)
+
+
+def generate_exam_single(topic: str, n: int, mcq_ratio: float):
     system_prompt = "You create strict JSON only. No extra text."
 
     prompt = f"""
@@ -76,7 +97,9 @@ Rules:
 - skill must be one of: concepts, definitions, examples, problem_solving
 """
 
-    raw = ask_ai(system_prompt, prompt)
+    # Never from the response cache: exams should differ run to run, and a
+    # cached invalid reply would fail every retry
+    raw = ask_ai(system_prompt, prompt, cache=False)
 
     try:
         return json.loads(raw), raw
@@ -84,6 +107,179 @@ Rules:
         raise ValueError("Model returned invalid JSON.\n\nRAW:\n" + raw[:1500])
 
 
+def plan_shards(n: int, mcq_ratio: float):
+    # Splits the exam into (type, skill) shards of at most SHARD_SIZE questions,
+    # spreading each type evenly over the skills.
+    if mcq_ratio == 0:
+        return [{"type": "essay", "skill": "examples", "count": 1}]
+
+    n_mcq = round(n * mcq_ratio)
+    wanted = {}
+    for qtype, count in (("mcq", n_mcq), ("short", n - n_mcq)):
+        for i in range(count):
+            key = (qtype, SKILLS[i % len(SKILLS)])
+            wanted[key] = wanted.get(key, 0) + 1
+
+    return split_shards(wanted)
+
+
+def split_shards(wanted):
+    # {(type, skill): count} -> evenly sized shards of at most SHARD_SIZE
+    shards = []
+    for (qtype, skill), count in wanted.items():
+        parts = -(-count // SHARD_SIZE)
+        for i in range(parts):
+            size = count // parts + (i < count % parts)
+            shards.append({"type": qtype, "skill": skill, "count": size})
+    return shards
+
+
+def parse_json_object(raw):
+    # Tolerates ```json fences and chatter around the object
+    start, end = raw.find("{"), raw.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("no JSON object in reply")
+    return json.loads(raw[start:end + 1])
+
+
+def valid_question(q, qtype):
+    if not isinstance(q, dict) or not str(q.get("q", "")).strip() or not isinstance(q.get("answer"), str):
+        return False
+    if qtype == "mcq":
+        choices = q.get("choices")
+        answer = q["answer"].strip().upper()
+        return isinstance(choices, list) and len(choices) == 4 and answer[:1] in ("A", "B", "C", "D")
+    return True
+
+
+def generate_shard(topic, shard, avoid=()):
+    # One request for `count` questions of one type and skill; returns only
+    # the questions that validate (may be fewer than asked for).
+    qtype, skill, count = shard["type"], shard["skill"], shard["count"]
+    example = {
+        "mcq": '{"type": "mcq", "q": "question text", "choices": ["A) ...", "B) ...", "C) ...", "D) ..."], '
+               '"answer": "A", "skill": "%s", "difficulty": "medium"}' % skill,
+        "short": '{"type": "short", "q": "question text", "answer": "short correct answer", '
+                 '"skill": "%s", "difficulty": "medium"}' % skill,
+        "essay": '{"type": "essay", "q": "essay question", "answer": "model answer", '
+                 '"skill": "%s", "difficulty": "medium"}' % skill,
+    }[qtype]
+    avoid_text = "\n".join(f"- {a}" for a in avoid)
+
+    prompt = f"""
+Create {count} {qtype} exam question(s) on: {topic}
+Every question tests the skill "{skill}".
+difficulty must be one of: easy, medium, hard (mix them).
+
+Return ONLY valid JSON exactly like:
+{{"questions": [{example}]}}
+"""
+    if avoid_text:
+        prompt += f"\nDo NOT repeat or rephrase any of these existing questions:\n{avoid_text}\n"
+
+    raw = ask_ai("You create strict JSON only. No extra text.", prompt,
+                 max_tokens=60 + count * TOKENS_PER_QUESTION[qtype], cache=False)
+    questions = parse_json_object(raw).get("questions", [])
+
+    valid = []
+    for q in questions[:count]:
+        if valid_question(q, qtype):
+            q["type"], q["skill"] = qtype, skill
+            if q.get("difficulty") not in DIFFICULTIES:
+                q["difficulty"] = "medium"
+            valid.append(q)
+    return valid, raw
+
+
+def question_key(q):
+    return " ".join(str(q["q"]).lower().split())
+
+
+def question_words(q):
+    return set(re.findall(r"\w+", question_key(q)))
+
+
+def is_duplicate(q, kept):
+    # Same words up to case, spacing and punctuation. Compared as word sets,
+    # not characters: "function" vs "class" is a different question even
+    # when the rest of the sentence matches.
+    words = question_words(q)
+    for other in kept:
+        other_words = question_words(other)
+        union = len(words | other_words)
+        if not union or len(words & other_words) / union >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def generate_exam_sharded(topic: str, n: int, mcq_ratio: float):
+    # Shards run concurrently; failed or short shards (invalid JSON, bad
+    # questions, duplicates) are regenerated for just the missing questions.
+    plan = plan_shards(n, mcq_ratio)
+    wanted = {}
+    for shard in plan:
+        key = (shard["type"], shard["skill"])
+        wanted[key] = wanted.get(key, 0) + shard["count"]
+
+    kept = []
+    raws = []
+    pending = plan
+    for attempt in range(SHARD_ATTEMPTS):
+        with ThreadPoolExecutor(max_workers=GEN_WORKERS) as pool:
+            futures = [
+                (shard, pool.submit(
+                    contextvars.copy_context().run, generate_shard, topic, shard,
+                    [q["q"] for q in kept if (q["type"], q["skill"]) == (shard["type"], shard["skill"])],
+                ))
+                for shard in pending
+            ]
+
+            failed = 0
+            for shard, fut in futures:
+                try:
+                    questions, raw = fut.result()
+                except Exception:
+                    failed += 1
+                    continue
+                raws.append(raw)
+                for q in questions:
+                    if not is_duplicate(q, kept):
+                        kept.append(q)
+
+        have = {}
+        for q in kept:
+            key = (q["type"], q["skill"])
+            have[key] = have.get(key, 0) + 1
+
+        pending = split_shards({key: count - have.get(key, 0)
+                                for key, count in wanted.items() if count > have.get(key, 0)})
+
+        if not pending or attempt + 1 == SHARD_ATTEMPTS:
+            break
+        print(f"↻ Regenerating {sum(s['count'] for s in pending)} question(s) "
+              f"({failed} shard(s) failed, round {attempt + 2}/{SHARD_ATTEMPTS})...")
+
+    if not kept:
+        raise ValueError("Model returned no valid questions.\n\nRAW:\n" + "\n".join(raws)[:1500])
+    if pending:
+        print(f"⚠️ Generated {len(kept)} of {n} questions.")
+
+    # Types in exam order, skills interleaved within each type
+    by_key = {}
+    for q in kept:
+        by_key.setdefault((q["type"], q["skill"]), []).append(q)
+    ordered = []
+    for qtype in ("mcq", "short", "essay"):
+        groups = [by_key[(t, s)] for t, s in wanted if t == qtype and (t, s) in by_key]
+        while any(groups):
+            for g in groups:
+                if g:
+                    ordered.append(g.pop(0))
+
+    exam = {"topic": topic, "questions": ordered[:n]}
+    return exam, "\n".join(raws)
+
+
 # ===============================
 # Grading Functions
 # ===============================
@@ -102,6 +298,7 @@ def grade_short(user, correct):
     return all(k in user for k in keywords) if keywords else (user == correct_l)
 
 
+@traced()
 def grade_essay_with_ai(question, student_answer):
     system_prompt = "You are a strict academic writing examiner. Return strict JSON only."
 
@@ -130,14 +327,29 @@ Return ONLY valid JSON like:
     try:
         return json.loads(raw)
     except:
-        return {
-            "band_score": 0,
-            "task_response": 0,
-            "coherence": 0,
-            "lexical_resource": 0,
-            "grammar": 0,
-            "feedback": "Failed to parse evaluation."
-        }
+        return failed_evaluation("Failed to parse evaluation.")
+
+
+def failed_evaluation(feedback):
+    return {
+        "band_score": 0,
+        "task_response": 0,
+        "coherence": 0,
+        "lexical_resource": 0,
+        "grammar": 0,
+        "feedback": feedback
+    }
+
+
+def timed_essay_grade(question, student_answer):
+    # Runs in the grading pool; returns (evaluation, seconds). An API error
+    # becomes a failed evaluation so it can't take the finished exam down.
+    start = time.perf_counter()
+    try:
+        evaluation = grade_essay_with_ai(question, student_answer)
+    except Exception as e:
+        evaluation = failed_evaluation(f"Grading failed: {type(e).__name__}: {e}")
+    return evaluation, time.perf_counter() - start
 
 
 # ===============================
@@ -150,65 +362,83 @@ def run_exam(exam, minutes: int):
     results = []
     score = 0
 
-    print(f"\n🧪 EXAM STARTED: {exam.get('topic','')}")
-    print(f"⏳ Time limit: {minutes} minutes")
-    print("Type 'skip' to skip a question.\n")
+    # Essays are graded in the background so the clock only runs on the
+    # student; all gradings are joined before returning
+    graders = ThreadPoolExecutor(max_workers=ESSAY_GRADERS)
+    pending = []
 
-    for i, q in enumerate(exam["questions"], 1):
+    try:
+        print(f"\n🧪 EXAM STARTED: {exam.get('topic','')}")
+        print(f"⏳ Time limit: {minutes} minutes")
+        print("Type 'skip' to skip a question.\n")
 
-        if time.time() > deadline:
-            print("\n⏰ Time is up!\n")
-            break
+        for i, q in enumerate(exam["questions"], 1):
 
-        print(f"Q{i}: {q['q']}")
-        qtype = q["type"]
+            if time.time() > deadline:
+                print("\n⏰ Time is up!\n")
+                break
 
-        essay_feedback = None
-        correct_flag = False
+            print(f"Q{i}: {q['q']}")
+            qtype = q["type"]
 
-        if qtype == "mcq":
-            for c in q["choices"]:
-                print(" ", c)
+            essay_feedback = None
+            correct_flag = False
 
-            user = input("Answer (A/B/C/D or skip): ").strip()
+            if qtype == "mcq":
+                for c in q["choices"]:
+                    print(" ", c)
 
-            if user.lower() != "skip":
-                correct_flag = grade_mcq(user, q["answer"])
+                user = input("Answer (A/B/C/D or skip): ").strip()
 
-        elif qtype == "short":
-            user = input("Answer (or skip): ").strip()
+                if user.lower() != "skip":
+                    correct_flag = grade_mcq(user, q["answer"])
 
-            if user.lower() != "skip":
-                correct_flag = grade_short(user, q["answer"])
+            elif qtype == "short":
+                user = input("Answer (or skip): ").strip()
 
-        elif qtype == "essay":
-            user = input("Write your essay (or skip):\n").strip()
+                if user.lower() != "skip":
+                    correct_flag = grade_short(user, q["answer"])
 
-            if user.lower() != "skip":
-                essay_feedback = grade_essay_with_ai(q["q"], user)
-                correct_flag = True  # Essay doesn't use right/wrong
+            elif qtype == "essay":
+                user = input("Write your essay (or skip):\n").strip()
 
-        else:
-            user = input("Answer: ").strip()
+                if user.lower() != "skip":
+                    pending.append((len(results), graders.submit(
+                        contextvars.copy_context().run, timed_essay_grade, q["q"], user)))
+                    correct_flag = True  # Essay doesn't use right/wrong
 
-        if qtype != "essay":
-            if correct_flag:
-                score += 1
-                print("✅ Correct\n")
             else:
-                print(f"❌ Correct answer: {q['answer']}\n")
-        else:
-            print("📝 Essay submitted for AI evaluation...\n")
-
-        results.append({
-            "q": q["q"],
-            "type": qtype,
-            "skill": q.get("skill", "unknown"),
-            "user_answer": user,
-            "correct_answer": q["answer"],
-            "correct": correct_flag,
-            "essay_evaluation": essay_feedback
-        })
+                user = input("Answer: ").strip()
+
+            if qtype != "essay":
+                if correct_flag:
+                    score += 1
+                    print("✅ Correct\n")
+                else:
+                    print(f"❌ Correct answer: {q['answer']}\n")
+            else:
+                print("📝 Essay submitted for AI evaluation...\n")
+
+            results.append({
+                "q": q["q"],
+                "type": qtype,
+                "skill": q.get("skill", "unknown"),
+                "user_answer": user,
+                "correct_answer": q["answer"],
+                "choices": q.get("choices"),
+                "difficulty": q.get("difficulty"),
+                "correct": correct_flag,
+                "essay_evaluation": essay_feedback
+            })
+
+        if pending:
+            print(f"⏳ Waiting for {len(pending)} essay evaluation(s)...")
+        for i, future in pending:
+            results[i]["essay_evaluation"], seconds = future.result()
+            results[i]["grading_seconds"] = round(seconds, 2)
+    finally:
+        # Nothing left to wait for unless the exam was interrupted
+        graders.shutdown(wait=False, cancel_futures=True)
 
     total = len(results)
     return score, total, results
@@ -231,6 +461,33 @@ def skill_breakdown(results):
     return stats
 
 
+# ===============================
+# Question Bank
+# ===============================
+def load_exam(topic, n, mcq_ratio):
+    # Instant exam from the bank when it covers the topic (least-used
+    # questions first), live generation otherwise. Returns (exam, refill
+    # future or None); the refill tops up unused questions for next time.
+    if not USE_QUESTION_BANK:
+        exam, _raw = generate_exam(topic, n, mcq_ratio)
+        return exam, None
+
+    from question_bank import fill
+
+    bank.harvest()
+    exam = bank.sample(topic, n, mcq_ratio)
+    if exam is not None:
+        print("📚 Exam drawn from the question bank.")
+        refill = None
+        if BANK_REFILL and not bank.covers(topic, n, mcq_ratio, unused=True):
+            refill = run_in_background(fill, bank, topic, n, mcq_ratio)
+        return exam, refill
+
+    exam, _raw = generate_exam(topic, n, mcq_ratio)
+    bank.add(topic, exam.get("questions", []), used=True)
+    return exam, None
+
+
 # ===============================
 # MAIN
 # ===============================
@@ -260,7 +517,7 @@ def main():
     minutes = input("Time limit in minutes (default 10): ").strip()
     minutes = int(minutes) if minutes.isdigit() else 10
 
-    exam, raw = generate_exam(topic, n, mcq_ratio)
+    exam, refill = load_exam(topic, n, mcq_ratio)
     score, total, results = run_exam(exam, minutes)
     stats = skill_breakdown(results)
 
@@ -286,10 +543,20 @@ def main():
             print("\n📝 Essay Evaluation:")
             for k, v in r["essay_evaluation"].items():
                 print(f"{k}: {v}")
+            print(f"(graded in {r['grading_seconds']} s)")
 
     path = save_report(report)
     print(f"\n✅ Report saved: {path}")
 
+    if refill is not None and not refill.done():
+        print("📚 Finishing question bank top-up...")
+    if refill is not None:
+        try:
+            print(f"📚 Added {refill.result()} new questions to the bank")
+        except Exception as e:
+            print(f"⚠️ Question bank top-up failed: {e}")
+    print_summary()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,16 +1,58 @@
 import os
-import math
-import json
-from openai import OpenAI
 
-client = OpenAI()
+# Only light modules load up front. numpy and the index stack (vector_store,
+# index_store, ann/bm25/quantization, corpus_ingest, the SQLite caches) are
+# imported inside the functions that use them, so the prompt appears before
+# they finish loading in the background.
+from text_chunker import iter_chunks
+from chat_stream import stream_chat, print_token, format_timing
+from context_packer import pack_context, format_budget
+from history_log import HistoryLog
+from embedding_pipeline import iter_embeddings, embed_all
+from llm_client import get_client
+from llm_metrics import traced, print_summary
+from startup import LazyObject, run_in_background
+
+client = get_client()   # shared pooled client: retries + rate limits (backend built on first call)
+embed_cache = LazyObject("embedding_cache", "EmbeddingCache")
+answer_cache = LazyObject("answer_cache", "AnswerCache", threshold=0.95)   # similarity needed to reuse an answer
 
 EMBED_MODEL = "text-embedding-3-small"
 CHAT_MODEL = "gpt-4o-mini"
-
-INDEX_FILE = "rag_index.json"
+STREAM_ANSWERS = True              # print tokens as they arrive
+LAZY_STARTUP = True                # show the prompt while the index opens in the background
+CONTEXT_BUDGET = 3000              # prompt tokens for system + context + history + question
+RETRIEVE_K = 8                     # candidates offered to the context packer
+
+INDEX_DIR = "rag_index"            # binary, memory-mapped index
+INDEX_FILE = "rag_index.json"      # legacy JSON index (read-only fallback)
+INDEX_DTYPE = "float32"            # or "float16" to halve vector storage
 DOC_FILE = "sample_doc.txt"
-HISTORY_FILE = "chat_history.json"
+DOC_PATHS = [DOC_FILE]             # files and/or directories to index
+DOC_INCLUDE = None                 # glob filters used when walking directories
+DOC_EXCLUDE = None                 # (None = corpus_ingest defaults)
+INGEST_WORKERS = None              # processes reading + chunking files (None = CPU count)
+HISTORY_FILE = "chat_history.jsonl"      # append-only log
+LEGACY_HISTORY_FILE = "chat_history.json"
+HISTORY_LOAD_LAST = 200                  # messages restored at startup
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+CHUNK_BOUNDARY = None              # None, "sentence" or "paragraph"
+CHUNK_UNIT = "chars"               # "chars" or "tokens" (sizes above in that unit)
+
+EMBED_CONCURRENCY = 4              # embedding requests in flight
+
+ANN_TYPE = None                    # None = exact search, "ivf" = inverted-file ANN
+ANN_NLIST = None                   # IVF lists (None = ~4 * sqrt(chunks))
+ANN_NPROBE = 8                     # lists scanned per query: recall vs latency knob
+
+VECTOR_CODEC = None                # None, "int8" (4x smaller) or "pq" (PQ_M bytes/vector)
+PQ_M = 96                          # PQ sub-vectors per embedding
+RERANK_FACTOR = 10                 # compressed shortlist size = k * RERANK_FACTOR
+
+RETRIEVAL_MODE = "vector"          # "vector", "lexical" (BM25, no API call) or "hybrid" (RRF)
+HYBRID_DEPTH = 4                   # each ranking contributes k * HYBRID_DEPTH candidates
 
 # ===============================
 # Load Document
@@ -29,140 +71,341 @@ def load_text_file(path: str) -> str:
 # ===============================
 # Chunk Text
 # ===============================
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100):
-    if overlap >= chunk_size:
-        raise ValueError("overlap must be smaller than chunk_size")
-
-    chunks = []
-    step = chunk_size - overlap
-    start = 0
-
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += step
-
-    return chunks
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    return [c for _, c in iter_chunks([text], chunk_size, overlap)]
 
 
 # ===============================
 # Embeddings
 # ===============================
+@traced()
 def embed_texts(texts):
-    resp = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=texts
-    )
-    return [d.embedding for d in resp.data]
-
+    return embed_all(client, EMBED_MODEL, texts, max_retries=0,   # client retries
+                     concurrency=EMBED_CONCURRENCY, cache=embed_cache)
 
-def cosine_similarity(a, b):
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(y * y for y in b))
 
-    if na == 0 or nb == 0:
-        return 0.0
-
-    return dot / (na * nb)
+def iter_embedded(texts):
+    # Flattens the batched pipeline into one vector per input, in order
+    for _, vecs in iter_embeddings(client, EMBED_MODEL, texts, max_retries=0,
+                                   concurrency=EMBED_CONCURRENCY, cache=embed_cache):
+        yield from vecs
 
 
 # ===============================
 # Build + Save Index
 # ===============================
-def build_index(chunks):
+def build_index(chunks, path=INDEX_DIR, extra_meta=None):
+    from index_store import IndexWriter, open_index_dir
+
     print("Creating embeddings...")
-    vectors = embed_texts(chunks)
+    writer = IndexWriter(path, dtype=INDEX_DTYPE)
+
+    try:
+        for i, (text, vec) in enumerate(zip(chunks, iter_embedded(chunks))):
+            writer.add(i, text, vec)
+    except Exception:
+        writer.abort()
+        raise
+
+    meta = {"embed_model": EMBED_MODEL}
+    meta.update(extra_meta or {})
+    writer.close(meta)
+    return ensure_side_indexes(open_index_dir(path), path)
+
+
+def ensure_side_indexes(index, path=INDEX_DIR):
+    if not index.meta:
+        # Legacy JSON index: no directory to write side files into;
+        # retrieval builds BM25 in memory when a query needs it
+        return index
+    return ensure_codec(ensure_ann(ensure_bm25(index, path), path), path)
+
+
+def ensure_codec(index, path=INDEX_DIR):
+    from index_store import save_codec
+    from quantization import CODECS
+
+    if VECTOR_CODEC is None or len(index) == 0:
+        index.codec = None
+        return index
+
+    info = index.meta.get("codec") or {}
+    if info.get("type") != VECTOR_CODEC or (VECTOR_CODEC == "pq" and info.get("m") != min(PQ_M, index.dim)):
+        print(f"Building {VECTOR_CODEC} compressed vectors...")
+        kwargs = {"m": PQ_M} if VECTOR_CODEC == "pq" else {}
+        index.codec = CODECS[VECTOR_CODEC].build(index.matrix, **kwargs)
+        index.meta = save_codec(path, index.codec)
+
+    index.codec.rerank_factor = RERANK_FACTOR
+    return index
 
-    return [
-        {"id": i, "text": c, "vec": v}
-        for i, (c, v) in enumerate(zip(chunks, vectors))
-    ]
+
+def ensure_bm25(index, path=INDEX_DIR):
+    # The lexical index is cheap, so every on-disk index gets one
+    from index_store import save_bm25
+    from bm25_index import BM25Index
+
+    if index.bm25 is None and len(index):
+        print("Building BM25 index...")
+        index.bm25 = BM25Index.build(index.texts)
+        index.meta = save_bm25(path, index.bm25)
+    return index
+
+
+def ensure_ann(index, path=INDEX_DIR):
+    from index_store import open_index_dir, save_ann
+    from ann_index import ANN_TYPES
+
+    if ANN_TYPE is None or len(index) == 0:
+        index.ann = None
+        return index
+
+    info = index.meta.get("ann") or {}
+    if info.get("type") == ANN_TYPE and (ANN_NLIST is None or info.get("nlist") == ANN_NLIST):
+        index.ann.nprobe = ANN_NPROBE
+        return index
+
+    print(f"Building {ANN_TYPE} ANN index...")
+    ann = ANN_TYPES[ANN_TYPE].build(index.matrix, nlist=ANN_NLIST, nprobe=ANN_NPROBE)
+    save_ann(path, ann)
+    return open_index_dir(path)
+
+
+def as_vector_index(index):
+    from vector_store import VectorIndex
+
+    if isinstance(index, VectorIndex):
+        return index
+    return VectorIndex.from_entries(index)
 
 
 def save_index(index):
-    with open(INDEX_FILE, "w", encoding="utf-8") as f:
-        json.dump(index, f)
+    from index_store import save_vector_index
+
+    save_vector_index(
+        INDEX_DIR,
+        as_vector_index(index),
+        dtype=INDEX_DTYPE,
+        extra_meta={"embed_model": EMBED_MODEL},
+    )
     print("Index saved ✅")
 
 
 def load_index():
-    if not os.path.exists(INDEX_FILE):
-        return None
+    from index_store import open_index_dir, load_json_index
 
-    with open(INDEX_FILE, "r", encoding="utf-8") as f:
+    index = open_index_dir(INDEX_DIR)
+    if index is not None:
         print("Index loaded ✅")
-        return json.load(f)
+        return index
+
+    # Fallback for old rag_index.json files
+    index = load_json_index(INDEX_FILE)
+    if index is not None:
+        print("Index loaded ✅ (legacy JSON — run "
+              f"'python index_store.py convert {INDEX_FILE} {INDEX_DIR}' for faster startup)")
+    return index
+
+
+# ===============================
+# Incremental Build (one file or a whole corpus)
+# ===============================
+def index_settings(chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    return {
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "boundary": CHUNK_BOUNDARY,
+        "unit": CHUNK_UNIT,
+        "embed_model": EMBED_MODEL,
+    }
+
+
+@traced()
+def update_index(index, paths=None, include=DOC_INCLUDE, exclude=DOC_EXCLUDE,
+                 workers=INGEST_WORKERS, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    # Re-chunks only files whose size/mtime/hash changed and re-embeds only
+    # chunks whose fingerprint is new; unchanged corpora cost a stat per file.
+    from corpus_ingest import update_corpus_index, DEFAULT_INCLUDE, DEFAULT_EXCLUDE, WORKERS
+
+    paths = paths or DOC_PATHS
+    if isinstance(paths, str):
+        paths = [paths]
+
+    missing = [p for p in paths if not os.path.exists(p)]
+    for p in missing:
+        print(f"⚠️ Not found: {os.path.abspath(p)}")
+    if missing and index is not None:
+        # Rebuilding now would drop that file's chunks; keep what we have
+        print("⚠️ Using the existing index unchanged.")
+        return ensure_side_indexes(index)
+    paths = [p for p in paths if p not in missing]
+    if not paths:
+        raise FileNotFoundError(f"File not found: {os.path.abspath(missing[0])}")
+
+    index, counts = update_corpus_index(
+        index, paths, INDEX_DIR, index_settings(chunk_size, overlap), iter_embedded,
+        dtype=INDEX_DTYPE, include=include or DEFAULT_INCLUDE,
+        exclude=exclude or DEFAULT_EXCLUDE, workers=workers or WORKERS,
+    )
+
+    if counts is not None:
+        print(f"Index update: {counts['files_chunked']} files re-chunked, "
+              f"{counts['reused']} chunks reused, {counts['embedded']} embedded, "
+              f"{counts['dropped']} dropped")
+        print("Index saved ✅")
+
+    return ensure_side_indexes(index)
+
+
+def prepare_index():
+    # Load, re-embed what changed, drop answers cached for an older index
+    index = load_index()
+
+    if index is None:
+        print("No index found. Building new index...")
+
+    # Re-embeds only chunks of DOC_PATHS that changed since the last build
+    index = update_index(index)
+
+    dropped = answer_cache.invalidate_other_versions(index_version(index))
+    if dropped:
+        print(f"Answer cache: {dropped} answers from an older index dropped")
+    return index
+
+
+def index_version(index):
+    return index.meta.get("version", "legacy-json")
+
+
+def describe_source(index, cid):
+    if getattr(index, "sources", None) is None:
+        return f"Chunk {cid}"
+    return index.sources.label(cid)
 
 
 # ===============================
 # Retrieval
 # ===============================
-def retrieve_top_k(index, question, k=3):
-    q_vec = embed_texts([question])[0]
+def retrieve_top_k(index, question, k=3, mode=None):
+    return retrieve_top_k_batch(index, [question], k=k, mode=mode)[0]
+
+
+@traced()
+def retrieve_top_k_batch(index, questions, k=3, mode=None):
+    from bm25_index import BM25Index, rrf_fuse
+
+    mode = mode or RETRIEVAL_MODE
+    engine = as_vector_index(index)
+    questions = list(questions)
 
-    scored = []
-    for item in index:
-        score = cosine_similarity(q_vec, item["vec"])
-        scored.append((score, item["id"], item["text"]))
+    if mode != "vector" and engine.bm25 is None:
+        engine.bm25 = BM25Index.build(engine.texts)   # legacy JSON index
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return scored[:k]
+    # Keyword fast path: no embedding round-trip at all
+    if mode == "lexical":
+        return [
+            [engine.entry(r, s) for r, s in zip(*engine.bm25.search(q, k))]
+            for q in questions
+        ]
+
+    # One embeddings call + one matrix product for all questions
+    q_vecs = embed_texts(questions)
+    if mode == "vector":
+        return engine.search_batch(q_vecs, k=k)
+
+    if mode != "hybrid":
+        raise ValueError("mode must be 'vector', 'lexical' or 'hybrid'")
+
+    depth = k * HYBRID_DEPTH
+    results = []
+    for q, (vec_rows, _) in zip(questions, engine.search_rows(q_vecs, depth)):
+        lex_rows, _ = engine.bm25.search(q, depth)
+        rows, scores = rrf_fuse([vec_rows, lex_rows], k)
+        results.append([engine.entry(r, s) for r, s in zip(rows, scores)])
+    return results
 
 
 # ===============================
 # Chat Memory RAG Answer
 # ===============================
-def answer_with_memory_rag(question, top_chunks, history):
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "You are a helpful assistant. "
+        "Use ONLY the provided document context. "
+        "If the answer is not in the context, say you don't know."
+    )
+}
 
-    # Step 7 — Memory trimming (keep last 20 messages max)
-    if len(history) > 20:
-        history = history[-20:]
 
-    context = "\n\n---\n\n".join([txt for _, _, txt in top_chunks])
+def build_rag_messages(question, top_chunks, history, budget=CONTEXT_BUDGET):
 
-    system_message = {
-        "role": "system",
-        "content": (
-            "You are a helpful assistant. "
-            "Use ONLY the provided document context. "
-            "If the answer is not in the context, say you don't know."
-        )
-    }
+    # Step 7 — Memory trimming: best chunks + newest turns that fit the budget
+    chunks, history, report = pack_context(
+        question, top_chunks, history, budget,
+        fixed_messages=[SYSTEM_MESSAGE], model=CHAT_MODEL,
+    )
+
+    context = "\n\n---\n\n".join([txt for _, _, txt in chunks])
 
     context_message = {
         "role": "system",
         "content": f"DOCUMENT CONTEXT:\n{context}"
     }
 
-    messages = [system_message, context_message]
+    messages = [SYSTEM_MESSAGE, context_message]
     messages.extend(history)
     messages.append({"role": "user", "content": question})
+    return messages, report
 
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        messages=messages,
-        max_tokens=300,
-        temperature=0.3   # Step 9 — Controlled factual output
-    )
 
+def rag_request(question, top_chunks, history, budget=CONTEXT_BUDGET):
+    messages, report = build_rag_messages(question, top_chunks, history, budget)
+    request = {
+        "model": CHAT_MODEL,
+        "messages": messages,
+        "max_tokens": 300,
+        "temperature": 0.3,   # Step 9 — Controlled factual output
+    }
+    return request, report
+
+
+# `prepared` is an already built rag_request() result, e.g. when the caller
+# needed the budget report first
+@traced()
+def answer_with_memory_rag(question, top_chunks, history, prepared=None):
+    request, _ = prepared or rag_request(question, top_chunks, history)
+    resp = client.chat.completions.create(**request)
     return resp.choices[0].message.content
 
 
+@traced()
+def stream_answer_with_memory_rag(question, top_chunks, history, on_token=print_token, prepared=None):
+    # Returns (answer, {"ttft", "total", "streamed", "budget"})
+    request, report = prepared or rag_request(question, top_chunks, history)
+    answer, timing = stream_chat(client, on_token=on_token, **request)
+    timing["budget"] = report
+    return answer, timing
+
+
 # ===============================
 # Chat History Persistence
 # ===============================
-def save_history(history):
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+history_log = HistoryLog(HISTORY_FILE, keep_messages=HISTORY_LOAD_LAST)
 
 
-def load_history():
-    if not os.path.exists(HISTORY_FILE):
-        return []
+def append_history(*messages):
+    history_log.append(*messages)
+
 
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+def reset_history():
+    history_log.reset()
+
+
+def load_history():
+    if history_log.import_json(LEGACY_HISTORY_FILE):
+        print(f"Imported {LEGACY_HISTORY_FILE} → {HISTORY_FILE} ✅")
+    return history_log.load(last_n=HISTORY_LOAD_LAST)
 
 
 # ===============================
@@ -172,14 +415,10 @@ if __name__ == "__main__":
 
     print("Current folder:", os.getcwd())
 
-    index = load_index()
-
-    if index is None:
-        print("No index found. Building new index...")
-        text = load_text_file(DOC_FILE)
-        chunks = chunk_text(text)
-        index = build_index(chunks)
-        save_index(index)
+    # Lazy startup: the index is opened (and updated) on a background thread
+    # and only waited for when the first question needs it
+    pending_index = run_in_background(prepare_index) if LAZY_STARTUP else None
+    index = None if LAZY_STARTUP else prepare_index()
 
     print("\n🧠 Chat‑Style Memory RAG Ready 🚀")
     print("Type 'reset' to clear memory.")
@@ -191,29 +430,64 @@ if __name__ == "__main__":
         question = input("\nYou: ").strip()
 
         if question.lower() == "exit":
+            s = embed_cache.stats()
+            print(f"Embedding cache: {s['hits']} hits / {s['misses']} misses "
+                  f"(~{s['tokens_saved']} tokens saved)")
+            a = answer_cache.stats()
+            print(f"Answer cache: {a['hits']} hits / {a['misses']} misses")
+            print_summary()
             break
 
         # Step 6 — Reset memory command
         if question.lower() == "reset":
             history = []
-            save_history(history)
+            reset_history()
             print("Memory cleared ✅")
             continue
 
-        top_chunks = retrieve_top_k(index, question, k=3)
+        if index is None:
+            if not pending_index.done():
+                print("⏳ Waiting for the index to finish loading...")
+            index = pending_index.result()
 
-        print("Top similarity scores:",
-              [round(score, 3) for score, _, _ in top_chunks])
+        top_chunks = retrieve_top_k(index, question, k=RETRIEVE_K)
 
-        answer = answer_with_memory_rag(question, top_chunks, history)
+        print(f"Top {RETRIEVAL_MODE} scores:",
+              [round(score, 3) for score, _, _ in top_chunks])
 
-        print("\n🤖 Assistant:\n", answer)
+        prepared = rag_request(question, top_chunks, history)
+        budget = prepared[1]
+        print(format_budget(budget))
+
+        # Near-duplicate question over the same chunks of the same index
+        # (lexical mode stays network-free, so it skips the vector lookup)
+        cached = None
+        if RETRIEVAL_MODE != "lexical":
+            q_vec = embed_texts([question])[0]   # embedding-cache hit
+            cached = answer_cache.lookup(q_vec, budget["chunk_ids"], index_version(index))
+
+        if cached:
+            answer = cached["answer"]
+            print(f"\n🤖 Assistant (cached, similarity {cached['similarity']:.3f}):\n", answer)
+        elif STREAM_ANSWERS:
+            print("\n🤖 Assistant:\n ", end="")
+            answer, timing = stream_answer_with_memory_rag(question, top_chunks, history, prepared=prepared)
+            print(f"\n{format_timing(timing)}")
+        else:
+            answer = answer_with_memory_rag(question, top_chunks, history, prepared=prepared)
+            print("\n🤖 Assistant:\n", answer)
+
+        if not cached and RETRIEVAL_MODE != "lexical":
+            answer_cache.store(q_vec, budget["chunk_ids"], index_version(index), question, answer)
 
         print("\nSources used:")
         for score, cid, _ in top_chunks:
-            print(f"- Chunk {cid} (score: {round(score, 3)})")
-
-        # Save conversation memory
-        history.append({"role": "user", "content": question})
-        history.append({"role": "assistant", "content": answer})
-        save_history(history)
\ No newline at end of file
+            if cid not in budget["chunk_ids"]:
+                continue
+            print(f"- {describe_source(index, cid)} (score: {round(score, 3)})")
+
+        # Save conversation memory (one append, no full rewrite)
+        turn = [{"role": "user", "content": question},
+                {"role": "assistant", "content": answer}]
+        history.extend(turn)
+        append_history(*turn)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import hashlib
+import unicodedata
+import numpy as np
+
+from token_count import count_tokens
+from llm_metrics import metrics
+from sqlite_store import SQLiteStore
+
+CACHE_FILE = os.path.join(".cache", "embeddings.sqlite")
+MAX_ENTRIES = 200_000
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+# ===============================
+# Embedding Cache (SQLite, LRU)
+# ===============================
+class EmbeddingCache(SQLiteStore):
+
+    tables = ("embeddings",)
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vec BLOB NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used);
+        """)
+
+    def get_many(self, model, texts):
+        keys = [cache_key(model, t) for t in texts]
+        found = {}
+
+        with self._lock:
+            # SQLite caps bound parameters, so look up in slices
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update((k, np.frombuffer(v, dtype=np.float32)) for k, v in rows)
+
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._db.commit()
+
+        results = [found.get(k) for k in keys]
+        for text, vec in zip(texts, results):
+            if vec is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.tokens_saved += count_tokens(text, model)
+
+        misses = sum(v is None for v in results)
+        metrics.record_cache("embeddings", len(keys) - misses, misses)
+        return results
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            vec = np.asarray(vec, dtype=np.float32)
+            rows.append((cache_key(model, text), model, vec.shape[0], vec.tobytes(), now))
+
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vec, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(self.max_entries)
+            self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+if __name__ == "__main__":
+    # python embedding_cache.py [stats|clear]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = EmbeddingCache()
+
+    if cmd == "clear":
+        cache.clear()
+        print("Embedding cache cleared ✅")
+    else:
+        print(f"📦 {cache.path}: {len(cache)} cached embeddings")
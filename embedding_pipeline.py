@@ -0,0 +1,100 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from token_count import count_tokens
+from llm_client import call_with_retry
+
+MAX_BATCH_ITEMS = 256       # inputs per embeddings request
+MAX_BATCH_TOKENS = 50_000   # tokens per embeddings request
+CONCURRENCY = 4             # requests in flight
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5          # seconds
+
+
+# ===============================
+# Batching
+# ===============================
+def iter_batches(texts, max_items=MAX_BATCH_ITEMS, max_tokens=MAX_BATCH_TOKENS, model=None):
+    # Works on any iterable so chunks can be produced lazily
+    batch = []
+    batch_tokens = 0
+
+    for text in texts:
+        n = count_tokens(text, model)
+        if batch and (len(batch) >= max_items or batch_tokens + n > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+
+        batch.append(text)
+        batch_tokens += n
+
+    if batch:
+        yield batch
+
+
+# ===============================
+# Single Request with Retry
+# ===============================
+def embed_batch(client, model, batch, max_retries=MAX_RETRIES, backoff=BACKOFF_BASE):
+    def request():
+        resp = client.embeddings.create(model=model, input=batch)
+        data = sorted(resp.data, key=lambda d: getattr(d, "index", 0))
+        return [d.embedding for d in data]
+
+    return call_with_retry(request, max_retries, backoff)
+
+
+# ===============================
+# Concurrent Pipeline
+# ===============================
+def iter_embeddings(
+    client,
+    model,
+    texts,
+    max_items=MAX_BATCH_ITEMS,
+    max_tokens=MAX_BATCH_TOKENS,
+    concurrency=CONCURRENCY,
+    max_retries=MAX_RETRIES,
+    cache=None,
+):
+    # Yields (batch_texts, vectors) in input order. At most
+    # 2 * concurrency batches are held in memory at any time.
+    batches = iter_batches(texts, max_items, max_tokens, model)
+    window = max(1, concurrency) * 2
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending = []
+
+        for batch in batches:
+            cached = cache.get_many(model, batch) if cache is not None else [None] * len(batch)
+            todo = [t for t, v in zip(batch, cached) if v is None]
+            # copy_context: worker threads report metrics under the caller's name
+            fut = pool.submit(contextvars.copy_context().run, embed_batch,
+                              client, model, todo, max_retries) if todo else None
+            pending.append((batch, cached, todo, fut))
+
+            if len(pending) >= window:
+                yield finish_batch(pending.pop(0), model, cache)
+
+        for item in pending:
+            yield finish_batch(item, model, cache)
+
+
+def finish_batch(item, model, cache):
+    batch, cached, todo, fut = item
+    if fut is None:
+        return batch, cached
+
+    fresh = fut.result()
+    if cache is not None:
+        cache.put_many(model, todo, fresh)
+
+    fresh = iter(fresh)
+    return batch, [v if v is not None else next(fresh) for v in cached]
+
+
+def embed_all(client, model, texts, **kwargs):
+    vectors = []
+    for _, vecs in iter_embeddings(client, model, texts, **kwargs):
+        vectors.extend(vecs)
+    return vectors
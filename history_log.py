@@ -0,0 +1,113 @@
+import os
+import json
+
+RESET = {"type": "reset"}
+TAIL_BLOCK = 64 * 1024
+
+
+# ===============================
+# Append-only Chat History (JSONL)
+# ===============================
+class HistoryLog:
+    # One JSON message per line. Appends never rewrite old data, a reset is
+    # a marker line, and compaction rewrites the file atomically.
+
+    def __init__(self, path, compact_bytes=1 << 20, keep_messages=200, fsync=True):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.keep_messages = keep_messages
+        self.fsync = fsync
+
+    # ---------- writing ----------
+    def append(self, *messages):
+        data = "".join(json.dumps(m, ensure_ascii=False) + "\n" for m in messages).encode("utf-8")
+
+        # O_APPEND + a single write: concurrent appenders never interleave lines
+        # (O_BINARY keeps Windows from translating newlines)
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            # Never glue a record onto a torn line left by a crash. lseek +
+            # read rather than pread, which Windows lacks; O_APPEND still
+            # sends the write to the end.
+            if os.fstat(fd).st_size:
+                os.lseek(fd, -1, os.SEEK_END)
+                if os.read(fd, 1) != b"\n":
+                    data = b"\n" + data
+            os.write(fd, data)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if os.path.getsize(self.path) > self.compact_bytes:
+            self.compact()
+
+    def reset(self):
+        self.append(RESET)
+
+    def compact(self):
+        messages = self.load(last_n=self.keep_messages)
+        tmp_path = self.path + ".tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for m in messages:
+                f.write(json.dumps(m, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+    # ---------- reading ----------
+    def iter_lines_reversed(self):
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            tail = b""
+
+            while pos > 0:
+                step = min(TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + tail).split(b"\n")
+                tail = lines.pop(0)
+                for line in reversed(lines):
+                    yield line
+
+            yield tail
+
+    def load(self, last_n=None):
+        # Reads from the end of the file only as far as needed
+        if not os.path.exists(self.path):
+            return []
+
+        messages = []
+        for line in self.iter_lines_reversed():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn line from an interrupted write
+
+            if record == RESET:
+                break
+            messages.append(record)
+            if last_n is not None and len(messages) >= last_n:
+                break
+
+        messages.reverse()
+
+        # Start on a user turn so a trimmed history never opens mid-exchange
+        while last_n is not None and messages and messages[0].get("role") == "assistant":
+            messages.pop(0)
+        return messages
+
+    # ---------- migration ----------
+    def import_json(self, json_path):
+        # One-time import of an old full-rewrite chat_history.json
+        if os.path.exists(self.path) or not os.path.exists(json_path):
+            return False
+
+        with open(json_path, "r", encoding="utf-8") as f:
+            self.append(*json.load(f))
+        return True
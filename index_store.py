@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import mmap
+import hashlib
+import uuid
+import shutil
+import numpy as np
+
+from vector_store import VectorIndex, normalize_rows
+from ann_index import load_ann
+from bm25_index import load_bm25
+from quantization import load_codec
+
+FORMAT_VERSION = 1
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "text_offsets.npy"
+HASHES_FILE = "chunk_hashes.npy"
+SOURCES_FILE = "chunk_sources.npy"
+STARTS_FILE = "chunk_starts.npy"
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+# ===============================
+# Text Store (memory-mapped UTF-8 blob)
+# ===============================
+class TextStore:
+
+    def __init__(self, path, offsets):
+        self.offsets = offsets
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap refuses zero-length files
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("text index out of range")
+
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._buf[start:end].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+
+# ===============================
+# Chunk Sources (file + char offset)
+# ===============================
+class ChunkSources:
+
+    def __init__(self, files, file_ids, starts):
+        self.files = files          # meta["files"] entries
+        self.file_ids = file_ids    # per chunk, index into files (-1 = unknown)
+        self.starts = starts        # per chunk, char offset in its file
+
+    def label(self, row):
+        f = int(self.file_ids[row])
+        if f < 0:
+            return f"chunk {row}"
+        return f"{self.files[f]['path']}:{int(self.starts[row])}"
+
+    def rows_of(self, file_idx):
+        # Writers emit chunks file by file, so each file's rows are contiguous
+        lo = np.searchsorted(self.file_ids, file_idx, side="left")
+        hi = np.searchsorted(self.file_ids, file_idx, side="right")
+        return range(int(lo), int(hi))
+
+
+def load_sources(path, meta):
+    sources_path = os.path.join(path, SOURCES_FILE)
+    if "files" not in meta or not os.path.exists(sources_path):
+        return None
+    return ChunkSources(
+        meta["files"],
+        np.load(sources_path, mmap_mode="r" if meta["count"] else None),
+        np.load(os.path.join(path, STARTS_FILE), mmap_mode="r" if meta["count"] else None),
+    )
+
+
+# ===============================
+# Chunk Fingerprints
+# ===============================
+def chunk_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_chunk_hashes(path):
+    hashes_path = os.path.join(path, HASHES_FILE)
+    if not os.path.exists(hashes_path):
+        return None
+    return np.load(hashes_path).tolist()
+
+
+# ===============================
+# Write Index
+# ===============================
+class IndexWriter:
+    # Streams rows to disk so building never holds all vectors in memory
+
+    RAW_VECTORS_FILE = "vectors.f32"
+    COPY_BLOCK_ROWS = 65536
+
+    def __init__(self, path, dtype="float32"):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}")
+
+        self.path = path
+        self.dtype = dtype
+        self.tmp_path = path + ".tmp"
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+        self.ids = []
+        self.offsets = [0]
+        self.hashes = []
+        self.sources = []
+        self.starts = []
+        self.dim = None
+        self._vec_file = open(os.path.join(self.tmp_path, self.RAW_VECTORS_FILE), "wb")
+        self._text_file = open(os.path.join(self.tmp_path, TEXTS_FILE), "wb")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, id_, text, vec, hash_=None, source=-1, start=0):
+        vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+        if self.dim is None:
+            self.dim = vec.shape[0]
+        elif vec.shape[0] != self.dim:
+            raise ValueError(f"Vector dim {vec.shape[0]} != index dim {self.dim}")
+
+        self._vec_file.write(normalize_rows(vec).tobytes())
+        data = text.encode("utf-8")
+        self._text_file.write(data)
+
+        self.ids.append(id_)
+        self.offsets.append(self.offsets[-1] + len(data))
+        self.hashes.append(hash_ if hash_ is not None else chunk_hash(text))
+        self.sources.append(source)
+        self.starts.append(start)
+
+    def add_many(self, ids, texts, vectors, hashes=None):
+        hashes = hashes if hashes is not None else [None] * len(ids)
+        for id_, text, vec, hash_ in zip(ids, texts, vectors, hashes):
+            self.add(id_, text, vec, hash_)
+
+    def close(self, extra_meta=None):
+        self._vec_file.close()
+        self._text_file.close()
+
+        count, dim = len(self.ids), self.dim or 0
+        raw_path = os.path.join(self.tmp_path, self.RAW_VECTORS_FILE)
+        out = np.lib.format.open_memmap(
+            os.path.join(self.tmp_path, VECTORS_FILE), mode="w+",
+            dtype=self.dtype, shape=(count, dim),
+        )
+        if count and dim:
+            raw = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(count, dim))
+            for start in range(0, count, self.COPY_BLOCK_ROWS):
+                out[start:start + self.COPY_BLOCK_ROWS] = raw[start:start + self.COPY_BLOCK_ROWS]
+            del raw
+        out.flush()
+        del out
+        os.remove(raw_path)
+
+        np.save(os.path.join(self.tmp_path, IDS_FILE), np.asarray(self.ids, dtype=np.int64))
+        np.save(os.path.join(self.tmp_path, OFFSETS_FILE), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(self.tmp_path, HASHES_FILE), np.asarray(self.hashes, dtype="S20"))
+        np.save(os.path.join(self.tmp_path, SOURCES_FILE), np.asarray(self.sources, dtype=np.int32))
+        np.save(os.path.join(self.tmp_path, STARTS_FILE), np.asarray(self.starts, dtype=np.int64))
+
+        meta = {
+            "format": FORMAT_VERSION,
+            "version": uuid.uuid4().hex,   # changes on every rebuild
+            "count": count,
+            "dim": dim,
+            "dtype": self.dtype,
+            "normalized": True,
+        }
+        meta.update(extra_meta or {})
+
+        with open(os.path.join(self.tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        replace_dir(self.tmp_path, self.path)
+        return meta
+
+    def abort(self):
+        self._vec_file.close()
+        self._text_file.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def write_index_dir(path, ids, texts, vectors, dtype="float32", extra_meta=None, hashes=None):
+    writer = IndexWriter(path, dtype=dtype)
+    try:
+        writer.add_many(ids, texts, vectors, hashes)
+    except Exception:
+        writer.abort()
+        raise
+    return writer.close(extra_meta)
+
+
+def update_meta(path, updates):
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"No index to update at {os.path.abspath(path)}")
+    meta.update(updates)
+
+    tmp_meta = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_meta, os.path.join(path, META_FILE))
+    return meta
+
+
+def replace_dir(src, dst):
+    # Windows can't rename a directory with open or mapped files in it:
+    # close_index() the old index before a rebuild replaces it
+    old_path = dst + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(dst):
+        os.rename(dst, old_path)
+    os.rename(src, dst)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def save_vector_index(path, engine, dtype="float32", extra_meta=None):
+    return write_index_dir(
+        path,
+        engine.ids,
+        list(engine.texts),
+        engine.matrix,
+        dtype=dtype,
+        extra_meta=extra_meta,
+    )
+
+
+# ===============================
+# Open Index
+# ===============================
+def read_meta(path):
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format: {meta.get('format')}")
+    return meta
+
+
+def open_index_dir(path, mmap_mode="r"):
+    meta = read_meta(path)
+    if meta is None:
+        return None
+
+    if meta["count"] == 0:
+        mmap_mode = None  # numpy cannot mmap zero-length arrays
+
+    matrix = np.load(os.path.join(path, VECTORS_FILE), mmap_mode=mmap_mode)
+    ids = np.load(os.path.join(path, IDS_FILE)).tolist()
+    offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode=mmap_mode)
+    texts = TextStore(os.path.join(path, TEXTS_FILE), offsets)
+
+    engine = VectorIndex(matrix, ids, texts, normalized=True, meta=meta, ann=load_ann(path, meta))
+    engine.sources = load_sources(path, meta)
+    engine.bm25 = load_bm25(path, meta)
+    engine.codec = load_codec(path, meta)
+    return engine
+
+
+def close_index(engine):
+    # Releases the text blob and the memory maps behind an opened index so
+    # its directory can be replaced; the engine is unusable afterwards
+    if isinstance(engine.texts, TextStore):
+        engine.texts.close()
+    engine.matrix = engine.texts = engine.sources = None
+    engine.ann = engine.bm25 = engine.codec = None
+
+
+def save_ann(path, ann):
+    return update_meta(path, {"ann": ann.save(path)})
+
+
+def save_bm25(path, bm25):
+    return update_meta(path, {"bm25": bm25.save(path)})
+
+
+def save_codec(path, codec):
+    return update_meta(path, {"codec": codec.save(path)})
+
+
+def load_json_index(json_path):
+    if not os.path.exists(json_path):
+        return None
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        return VectorIndex.from_entries(json.load(f))
+
+
+# ===============================
+# JSON -> Binary Converter
+# ===============================
+def convert_json_index(json_path, out_path, dtype="float32"):
+    engine = load_json_index(json_path)
+    if engine is None:
+        raise FileNotFoundError(f"File not found: {json_path}")
+    return save_vector_index(out_path, engine, dtype=dtype)
+
+
+if __name__ == "__main__":
+    # python index_store.py convert rag_index.json rag_index [float32|float16]
+    if len(sys.argv) < 4 or sys.argv[1] != "convert":
+        print("Usage: python index_store.py convert <index.json> <out_dir> [float32|float16]")
+        sys.exit(1)
+
+    dtype = sys.argv[4] if len(sys.argv) > 4 else "float32"
+    meta = convert_json_index(sys.argv[2], sys.argv[3], dtype=dtype)
+    print(f"Converted {meta['count']} chunks ({meta['dtype']}, dim={meta['dim']}) → {sys.argv[3]} ✅")
@@ -0,0 +1,358 @@
+import os
+import sys
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from token_count import count_tokens, count_message_tokens
+from llm_metrics import metrics, instrument_stream, start_from_env
+
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+OPENAI_TRANSIENT_ERRORS = ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError")
+
+# Every setting can be overridden from the environment, so scripts need no flags
+DEFAULT_MODEL = "gpt-4o-mini"
+BACKEND = os.getenv("LLM_BACKEND", "openai")          # "openai" or "fake"
+BASE_URL = os.getenv("LLM_BASE_URL")                  # e.g. a local stub server
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))       # seconds per request
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+KEEPALIVE_SECONDS = 30.0
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE = 0.5                                    # seconds
+BACKOFF_MAX = 20.0
+RPM = int(os.getenv("LLM_RPM", "0"))                  # requests / minute, 0 = unlimited
+TPM = int(os.getenv("LLM_TPM", "0"))                  # tokens / minute, 0 = unlimited
+DEFAULT_COMPLETION_TOKENS = 256                       # reserved when max_tokens is unset
+RESPONSE_CACHE = os.getenv("LLM_RESPONSE_CACHE")      # opt-in: "1" or a .sqlite path
+
+
+# ===============================
+# Retries
+# ===============================
+def is_transient(err):
+    if isinstance(err, TRANSIENT_ERRORS):
+        return True
+    # openai is imported lazily by OpenAIBackend; if it was never loaded,
+    # none of its errors can be in flight
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(err, tuple(getattr(openai, n) for n in OPENAI_TRANSIENT_ERRORS)):
+        return True
+    status = getattr(err, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retry(fn, max_retries=MAX_RETRIES, backoff=BACKOFF_BASE, on_retry=None):
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as err:
+            if attempt >= max_retries or not is_transient(err):
+                raise
+            if on_retry:
+                on_retry(attempt, err)
+            time.sleep(backoff_delay(attempt, backoff))
+            attempt += 1
+
+
+# ===============================
+# Rate Limiting
+# ===============================
+class RateLimiter:
+    # Two token buckets (requests and tokens per minute). acquire() blocks
+    # until both have room; settle() corrects the token estimate afterwards.
+
+    def __init__(self, rpm=RPM, tpm=TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self._last = now - self._last, now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        if not self.rpm and not self.tpm:
+            return
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+
+        while True:
+            with self._lock:
+                self._refill()
+                need_r = 1 - self._requests if self.rpm else 0
+                need_t = tokens - self._tokens if self.tpm else 0
+                if need_r <= 0 and need_t <= 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+                wait = max(need_r * 60 / self.rpm if self.rpm else 0,
+                           need_t * 60 / self.tpm if self.tpm else 0)
+            time.sleep(wait)
+
+    def settle(self, estimated, actual):
+        if self.tpm and actual is not None:
+            with self._lock:
+                self._tokens = min(self.tpm, self._tokens + estimated - actual)
+
+
+# ===============================
+# Backends
+# ===============================
+class OpenAIBackend:
+    # One pooled keep-alive HTTP client for the whole process; retries are
+    # handled by LLMClient, so the SDK's own retry loop is switched off.
+
+    def __init__(self, base_url=BASE_URL, timeout=TIMEOUT, connect_timeout=CONNECT_TIMEOUT,
+                 max_connections=MAX_CONNECTIONS, api_key=None):
+        import httpx
+        from openai import OpenAI
+
+        self.http = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ),
+        )
+        self.client = OpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url,
+            http_client=self.http,
+            max_retries=0,
+        )
+
+    def chat(self, **request):
+        return self.client.chat.completions.create(**request)
+
+    def embed(self, **request):
+        return self.client.embeddings.create(**request)
+
+    def close(self):
+        self.http.close()
+
+
+class FakeBackend:
+    # In-process stand-in for tests and benchmarks: no network, deterministic.
+    # `reply` is a string or a function(messages) -> string.
+
+    def __init__(self, reply=None, latency=0.0, dim=256):
+        self.reply = reply
+        self.latency = latency
+        self.dim = dim
+        self.calls = 0
+
+    def text_for(self, messages):
+        if callable(self.reply):
+            return self.reply(messages)
+        if self.reply is not None:
+            return self.reply
+        return f"(fake reply to: {messages[-1]['content'][:80]})"
+
+    def chat(self, model=DEFAULT_MODEL, messages=(), stream=False, **params):
+        self.calls += 1
+        time.sleep(self.latency)
+        text = self.text_for(list(messages))
+        usage = SimpleNamespace(
+            prompt_tokens=count_message_tokens(list(messages), model),
+            completion_tokens=count_tokens(text, model),
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+
+        if not stream:
+            message = SimpleNamespace(role="assistant", content=text)
+            return SimpleNamespace(model=model, usage=usage,
+                                   choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+        def chunks():
+            for word in text.split(" "):
+                delta = SimpleNamespace(content=word + " ")
+                yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta)])
+        return chunks()
+
+    def embed(self, model="text-embedding-3-small", input=(), **params):
+        import numpy as np
+
+        self.calls += 1
+        time.sleep(self.latency)
+        texts = [input] if isinstance(input, str) else list(input)
+        data = []
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dim)
+            data.append(SimpleNamespace(index=i, embedding=vec.tolist()))
+        usage = SimpleNamespace(prompt_tokens=sum(count_tokens(t, model) for t in texts))
+        usage.total_tokens = usage.prompt_tokens
+        return SimpleNamespace(model=model, data=data, usage=usage)
+
+    def close(self):
+        pass
+
+
+BACKENDS = {"openai": OpenAIBackend, "fake": FakeBackend}
+
+
+# ===============================
+# Shared Client
+# ===============================
+class LLMClient:
+    # Drop-in for the OpenAI client where this repo uses it:
+    # client.chat.completions.create(...) and client.embeddings.create(...),
+    # plus retries with jittered backoff and request/token rate limiting.
+
+    def __init__(self, backend=None, max_retries=MAX_RETRIES, backoff=BACKOFF_BASE,
+                 limiter=None, response_cache=RESPONSE_CACHE):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self._cache_spec = response_cache
+        self._cache = None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = limiter or RateLimiter()
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_chat))
+        self.embeddings = SimpleNamespace(create=self.create_embeddings)
+
+    @property
+    def backend(self):
+        # Built on first request so importing a script stays cheap
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = BACKENDS[BACKEND]()
+        return self._backend
+
+    @property
+    def response_cache(self):
+        # ResponseCache, a path or "1"/True for the default file, or None (off)
+        spec = self._cache_spec
+        if self._cache is None and spec and spec not in ("0", "false"):
+            with self._backend_lock:
+                if self._cache is None:
+                    from response_cache import ResponseCache, CACHE_FILE
+                    if isinstance(spec, ResponseCache):
+                        self._cache = spec
+                    else:
+                        self._cache = ResponseCache(CACHE_FILE if spec in (True, "1", "true") else spec)
+        return self._cache
+
+    def _call(self, op, fn, estimated, request):
+        retries = [0]
+        start = time.perf_counter()
+
+        def attempt():
+            self.limiter.acquire(estimated)
+            return fn(**request)
+
+        def on_retry(n, err):
+            retries[0] = n + 1
+
+        model = request.get("model")
+        try:
+            resp = call_with_retry(attempt, self.max_retries, self.backoff, on_retry)
+        except Exception as err:
+            metrics.record_call(op, model, time.perf_counter() - start, retries=retries[0],
+                                error=type(err).__name__, stream=bool(request.get("stream")))
+            raise
+
+        usage = getattr(resp, "usage", None)
+        self.limiter.settle(estimated, getattr(usage, "total_tokens", None))
+
+        if request.get("stream") and not hasattr(resp, "choices"):
+            prompt = count_message_tokens(request.get("messages", []), model)
+            return instrument_stream(resp, op, model, start, retries[0], prompt, count_tokens)
+
+        metrics.record_call(
+            op, model, time.perf_counter() - start,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            retries=retries[0],
+        )
+        return resp
+
+    def create_chat(self, cache=True, **request):
+        # cache=False skips the response cache for this one request
+        response_cache = self.response_cache if cache else None
+        if response_cache is not None:
+            from response_cache import cacheable
+            if cacheable(request, response_cache.max_temperature):
+                resp = response_cache.get(request)
+                if resp is None:
+                    start = time.perf_counter()
+                    resp = self._chat(request)
+                    response_cache.put(request, resp, time.perf_counter() - start)
+                return resp
+        return self._chat(request)
+
+    def _chat(self, request):
+        model = request.get("model")
+        estimated = count_message_tokens(request.get("messages", []), model) + \
+            (request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+        return self._call("chat", self.backend.chat, estimated, request)
+
+    def create_embeddings(self, **request):
+        texts = request.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        estimated = sum(count_tokens(t, request.get("model")) for t in texts)
+        return self._call("embed", self.backend.embed, estimated, request)
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                start_from_env()
+                _client = LLMClient()
+    return _client
+
+
+def set_client(client):
+    # Swap in e.g. LLMClient(FakeBackend()) for tests and benchmarks
+    global _client
+    _client = client
+    return client
+
+
+# ===============================
+# ask_ai Helpers
+# ===============================
+def chat(messages, model=DEFAULT_MODEL, **params):
+    resp = get_client().chat.completions.create(model=model, messages=messages, **params)
+    return resp.choices[0].message.content
+
+
+def ask(system_prompt, user_prompt, model=DEFAULT_MODEL, **params):
+    return chat(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        model=model,
+        **params,
+    )
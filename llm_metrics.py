@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+
+TRACE_FILE = os.getenv("LLM_TRACE_FILE")              # JSONL, one line per call
+METRICS_PORT = int(os.getenv("LLM_METRICS_PORT", "0"))  # Prometheus endpoint, 0 = off
+
+# Prometheus-style cumulative buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SAMPLES_KEPT = 10_000      # per series, for the percentiles in summary()
+
+# Name of the function that issued the call (set by @traced)
+current_caller = contextvars.ContextVar("llm_caller", default=None)
+
+
+# ===============================
+# Histogram
+# ===============================
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=SAMPLES_KEPT)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.samples.append(value)
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+# ===============================
+# Metrics Registry
+# ===============================
+class Metrics:
+    # Series are keyed by (op, model, caller): op is "chat" or "embed",
+    # caller is the @traced function the request came from.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {}
+        self.spans = {}
+        self.cache = {}
+        self._trace = None
+
+    def _series(self, key):
+        s = self.series.get(key)
+        if s is None:
+            s = self.series[key] = {
+                "latency": Histogram(), "ttfb": Histogram(),
+                "calls": 0, "errors": 0, "retries": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+            }
+        return s
+
+    def record_call(self, op, model, wall, ttfb=None, prompt_tokens=0, completion_tokens=0,
+                    retries=0, error=None, stream=False):
+        caller = current_caller.get()
+        with self._lock:
+            s = self._series((op, model or "", caller or ""))
+            s["calls"] += 1
+            s["errors"] += error is not None
+            s["retries"] += retries
+            s["prompt_tokens"] += prompt_tokens or 0
+            s["completion_tokens"] += completion_tokens or 0
+            s["latency"].observe(wall)
+            s["ttfb"].observe(wall if ttfb is None else ttfb)
+
+        self.trace({
+            "ts": round(time.time(), 3), "op": op, "model": model, "caller": caller,
+            "wall_ms": round(wall * 1000, 2),
+            "ttfb_ms": round((wall if ttfb is None else ttfb) * 1000, 2),
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "retries": retries, "stream": stream, "error": error,
+        })
+
+    def record_span(self, name, wall, error=None):
+        with self._lock:
+            h = self.spans.get(name)
+            if h is None:
+                h = self.spans[name] = Histogram()
+            h.observe(wall)
+        self.trace({"ts": round(time.time(), 3), "span": name,
+                    "wall_ms": round(wall * 1000, 2), "error": error})
+
+    def record_cache(self, name, hits=0, misses=0):
+        with self._lock:
+            c = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            c["hits"] += hits
+            c["misses"] += misses
+        if hits or misses:
+            self.trace({"ts": round(time.time(), 3), "cache": name, "hits": hits, "misses": misses})
+
+    # ---------- JSONL trace ----------
+    def enable_trace(self, path):
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+            self._trace = open(path, "a", encoding="utf-8", buffering=1)
+
+    def trace(self, record):
+        if self._trace is None:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._trace.write(line)
+
+    # ---------- exports ----------
+    def totals(self, op=None):
+        # Counters summed over every series (optionally one op)
+        keys = ("calls", "errors", "retries", "prompt_tokens", "completion_tokens")
+        out = dict.fromkeys(keys, 0)
+        with self._lock:
+            for (series_op, _model, _caller), s in self.series.items():
+                if op is None or series_op == op:
+                    for k in keys:
+                        out[k] += s[k]
+        return out
+
+    def prometheus(self):
+        lines = []
+
+        def histogram(name, help_, items):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in items:
+                cumulative = 0
+                for bound, n in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        def counter(name, help_, items):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in items:
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        with self._lock:
+            series = [(f'op="{op}",model="{model}",caller="{caller}"', s)
+                      for (op, model, caller), s in sorted(self.series.items())]
+            histogram("llm_request_seconds", "Wall time per LLM request.",
+                      [(labels, s["latency"]) for labels, s in series])
+            histogram("llm_first_byte_seconds", "Time to first byte/token per LLM request.",
+                      [(labels, s["ttfb"]) for labels, s in series])
+            for key, help_ in (("calls", "LLM requests."), ("errors", "Failed LLM requests."),
+                               ("retries", "Retried attempts."),
+                               ("prompt_tokens", "Prompt tokens."),
+                               ("completion_tokens", "Completion tokens.")):
+                counter(f"llm_{key}_total", help_, [(labels, s[key]) for labels, s in series])
+            histogram("llm_span_seconds", "Wall time of instrumented functions.",
+                      [(f'name="{n}"', h) for n, h in sorted(self.spans.items())])
+            counter("llm_cache_hits_total", "Cache hits.",
+                    [(f'cache="{n}"', c["hits"]) for n, c in sorted(self.cache.items())])
+            counter("llm_cache_misses_total", "Cache misses.",
+                    [(f'cache="{n}"', c["misses"]) for n, c in sorted(self.cache.items())])
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # Human-readable table for the end of a chat/exam session
+        def ms(v):
+            return "-" if v is None else f"{v * 1000:.0f}"
+
+        with self._lock:
+            if not self.series and not self.spans:
+                return "📈 No LLM calls recorded."
+
+            out = ["📈 LLM calls"]
+            for (op, model, caller), s in sorted(self.series.items()):
+                lat, ttfb = s["latency"], s["ttfb"]
+                out.append(
+                    f"- {caller or op} [{op} {model}] {s['calls']} calls · "
+                    f"p50 {ms(lat.percentile(50))} / p95 {ms(lat.percentile(95))} ms · "
+                    f"first byte p50 {ms(ttfb.percentile(50))} ms · "
+                    f"tokens {s['prompt_tokens']} in / {s['completion_tokens']} out · "
+                    f"retries {s['retries']} · errors {s['errors']}"
+                )
+            for name, h in sorted(self.spans.items()):
+                out.append(f"- {name}: {h.count} runs · p50 {ms(h.percentile(50))} / "
+                           f"p95 {ms(h.percentile(95))} ms · total {h.sum:.1f} s")
+            for name, c in sorted(self.cache.items()):
+                total = c["hits"] + c["misses"]
+                rate = c["hits"] / total if total else 0.0
+                out.append(f"- {name} cache: {c['hits']} hits / {c['misses']} misses ({rate:.0%})")
+        return "\n".join(out)
+
+    def reset(self):
+        with self._lock:
+            self.series.clear()
+            self.spans.clear()
+            self.cache.clear()
+
+
+metrics = Metrics()
+_server = None
+
+
+# ===============================
+# Instrumentation Helpers
+# ===============================
+def traced(name=None):
+    # Decorator: times the function as a span and tags every LLM call made
+    # inside it (same thread or propagated context) with its name. Nested
+    # traced functions keep the outermost name, e.g. grade_essay_with_ai
+    # rather than the ask_ai helper it calls.
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            token = current_caller.set(current_caller.get() or label)
+            start = time.perf_counter()
+            error = None
+            try:
+                return fn(*args, **kwargs)
+            except Exception as err:
+                error = type(err).__name__
+                raise
+            finally:
+                metrics.record_span(label, time.perf_counter() - start, error)
+                current_caller.reset(token)
+        return inner
+    return wrap
+
+
+def instrument_stream(chunks, op, model, start, retries, prompt_tokens, count_tokens):
+    # Wraps a streaming response: first chunk -> TTFB, exhaustion -> record
+    ttfb = None
+    parts = []
+    error = None
+    try:
+        for chunk in chunks:
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            choices = getattr(chunk, "choices", None)
+            if choices:
+                delta = getattr(choices[0].delta, "content", None)
+                if delta:
+                    parts.append(delta)
+            yield chunk
+    except Exception as err:
+        error = type(err).__name__
+        raise
+    finally:
+        metrics.record_call(op, model, time.perf_counter() - start, ttfb,
+                            prompt_tokens, count_tokens("".join(parts), model),
+                            retries, error, stream=True)
+
+
+def serve_prometheus(port=METRICS_PORT, host="127.0.0.1"):
+    # GET /metrics in a daemon thread; returns the server
+    global _server
+    if _server is not None:
+        return _server
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def start_from_env():
+    # Called once by llm_client when the shared client is created
+    if TRACE_FILE and metrics._trace is None:
+        metrics.enable_trace(TRACE_FILE)
+    if METRICS_PORT:
+        serve_prometheus(METRICS_PORT)
+
+
+def print_summary(file=None):
+    print(metrics.summary(), file=file or sys.stdout)
+
+
+if __name__ == "__main__":
+    # python llm_metrics.py summary <trace.jsonl>
+    if len(sys.argv) < 3 or sys.argv[1] != "summary":
+        print("Usage: python llm_metrics.py summary <trace.jsonl>")
+        sys.exit(1)
+
+    # Rebuild the registry from a trace file written by an earlier run
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue
+            if "op" in r:
+                token = current_caller.set(r.get("caller"))
+                metrics.record_call(r["op"], r.get("model"), r["wall_ms"] / 1000, r["ttfb_ms"] / 1000,
+                                    r.get("prompt_tokens") or 0, r.get("completion_tokens") or 0,
+                                    r.get("retries", 0), r.get("error"), r.get("stream", False))
+                current_caller.reset(token)
+            elif "span" in r:
+                metrics.record_span(r["span"], r["wall_ms"] / 1000, r.get("error"))
+            elif "cache" in r:
+                metrics.record_cache(r["cache"], r.get("hits", 0), r.get("misses", 0))
+
+    print_summary()
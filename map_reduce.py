@@ -0,0 +1,249 @@
+import os
+import re
+import sys
+import time
+import zlib
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import ask
+from llm_metrics import metrics, traced
+from sqlite_store import SQLiteStore
+from text_chunker import iter_chunks
+from token_count import count_tokens
+
+MODEL = "gpt-4o-mini"
+CACHE_FILE = os.path.join(".cache", "map_outputs.sqlite")
+MAX_ENTRIES = 100_000
+
+SINGLE_PASS_TOKENS = 6000    # texts up to this size go in one request
+CHUNK_TOKENS = 2000          # hard cap per map chunk
+MIN_CHUNK_TOKENS = 500       # content-defined cuts only after this much
+CUT_EVERY = 4                # ~1 in CUT_EVERY pieces may end a chunk
+REDUCE_TOKENS = 3000         # partial results combined per reduce request
+MAP_WORKERS = 8
+MAP_MAX_TOKENS = 500         # reply cap for map and reduce steps
+
+# Cut candidates, coarsest first: paragraphs, lines, sentences
+BOUNDARY_RES = (
+    re.compile(r"\n\s*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?])\s+"),
+)
+
+
+# ===============================
+# Content-Defined Chunking
+# ===============================
+def split_at(text, pattern):
+    # Pieces ending at each match, separators kept so "".join() == text
+    start = 0
+    for m in pattern.finditer(text):
+        if m.end() > start:
+            yield text[start:m.end()]
+            start = m.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def split_pieces(text, max_tokens, model=None, level=0):
+    # Paragraphs; a paragraph over max_tokens is split into lines and a
+    # line into sentences, so text without blank lines still gets
+    # content-defined cut points. Only a single sentence over max_tokens
+    # falls back to fixed-size parts.
+    for piece in split_at(text, BOUNDARY_RES[level]):
+        if count_tokens(piece, model) <= max_tokens:
+            yield piece
+        elif level + 1 < len(BOUNDARY_RES):
+            yield from split_pieces(piece, max_tokens, model, level + 1)
+        else:
+            for _, part in iter_chunks([piece], max_tokens, 0, "sentence", "tokens", model):
+                yield part
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, min_tokens=MIN_CHUNK_TOKENS, model=None):
+    # Packs pieces into chunks of at most max_tokens. Besides the size
+    # cap, a chunk ends after a piece whose hash hits 0 mod CUT_EVERY,
+    # so cut points depend on content, not position: an edit only changes
+    # the chunks around it and the rest keep their cache keys.
+    chunks = []
+    current, current_tokens = [], 0
+    for par in split_pieces(text, max_tokens, model):
+        tokens = count_tokens(par, model)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+
+        current.append(par)
+        current_tokens += tokens
+        if current_tokens >= min_tokens and zlib.crc32(par.strip().encode("utf-8")) % CUT_EVERY == 0:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+# ===============================
+# Step Cache (SQLite)
+# ===============================
+class StepCache(SQLiteStore):
+    # Output of one map/reduce request, keyed by a hash of model, prompt
+    # and input text
+
+    tables = ("outputs",)
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS outputs (
+                key TEXT PRIMARY KEY,
+                output TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_outputs_used ON outputs(last_used);
+        """)
+
+    @staticmethod
+    def key(model, system_prompt, text):
+        return hashlib.sha256(f"{model}\0{system_prompt}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT output FROM outputs WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("UPDATE outputs SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.record_cache("map_outputs", hits=int(row is not None), misses=int(row is None))
+        return row[0] if row else None
+
+    def put(self, key, output):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO outputs (key, output, last_used) VALUES (?, ?, ?)",
+                             (key, output, time.time()))
+            self._evict(self.max_entries)
+            self._db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = StepCache()
+    return _cache
+
+
+# ===============================
+# Map-Reduce
+# ===============================
+def map_prompt(instruction):
+    return (f"{instruction}\n\nYou are given one part of a longer document. "
+            "Work only from this part; the results for all parts are combined afterwards.")
+
+
+def reduce_prompt(instruction):
+    return (f"{instruction}\n\nYou are given partial results for consecutive parts of one "
+            "document, in order. Combine them into one result for the whole document, "
+            "merging repeats and keeping the same format.")
+
+
+def cached_ask(system_prompt, text, model, cache):
+    # Returns (output, came_from_cache)
+    key = cache.key(model, system_prompt, text) if cache is not None else None
+    if key is not None:
+        out = cache.get(key)
+        if out is not None:
+            return out, True
+
+    out = ask(system_prompt, text, model=model, max_tokens=MAP_MAX_TOKENS)
+    if key is not None:
+        cache.put(key, out)
+    return out, False
+
+
+def run_parallel(fn, items, workers):
+    # Keeps order; the copied context keeps the @traced caller label
+    if len(items) == 1:
+        return [fn(items[0])]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+
+def group_for_reduce(outputs, max_tokens=REDUCE_TOKENS, model=None):
+    # Consecutive outputs packed into groups of at most max_tokens (at
+    # least two per group so every level shrinks)
+    groups, current, current_tokens = [], [], 0
+    for out in outputs:
+        tokens = count_tokens(out, model)
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(out)
+        current_tokens += tokens
+    if len(current) == 1 and groups:
+        groups[-1].extend(current)   # a lone leftover would only be re-summarized
+    elif current:
+        groups.append(current)
+    return groups
+
+
+@traced()
+def map_reduce(instruction, text, model=MODEL, chunk_tokens=CHUNK_TOKENS,
+               workers=MAP_WORKERS, cache=True):
+    # Returns (result, stats). Map runs concurrently over content-defined
+    # chunks; reduce combines partial results level by level until one is
+    # left. Every step's output is cached, so re-running on an edited file
+    # only repeats the changed chunks and the reduce steps above them.
+    cache = get_cache() if cache is True else (cache or None)
+    stats = {"chunks": 0, "levels": 0, "requests": 0, "cached": 0}
+
+    chunks = chunk_text(text, chunk_tokens, min(MIN_CHUNK_TOKENS, chunk_tokens // 2), model)
+    stats["chunks"] = len(chunks)
+
+    def step(system_prompt, texts):
+        results = run_parallel(lambda t: cached_ask(system_prompt, t, model, cache), texts, workers)
+        hits = sum(cached for _, cached in results)
+        stats["cached"] += hits
+        stats["requests"] += len(results) - hits
+        return [out for out, _ in results]
+
+    outputs = step(map_prompt(instruction), chunks)
+
+    while len(outputs) > 1:
+        stats["levels"] += 1
+        groups = group_for_reduce(outputs, REDUCE_TOKENS, model)
+        outputs = step(reduce_prompt(instruction),
+                       ["\n\n".join(f"Part {i}:\n{out}" for i, out in enumerate(group, 1)) for group in groups])
+
+    return (outputs[0] if outputs else ""), stats
+
+
+def needs_map_reduce(text, model=MODEL):
+    return count_tokens(text, model) > SINGLE_PASS_TOKENS
+
+
+if __name__ == "__main__":
+    # python map_reduce.py [stats|clear]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_cache()
+
+    if cmd == "clear":
+        cache.clear()
+        print("Map-reduce cache cleared ✅")
+    else:
+        print(f"🧩 {cache.path}: {len(cache)} cached step outputs")
@@ -0,0 +1,205 @@
+import os
+import numpy as np
+
+from vector_store import top_k_indices
+
+INT8_CODES_FILE = "int8_codes.npy"
+INT8_SCALES_FILE = "int8_scales.npy"
+PQ_CODES_FILE = "pq_codes.npy"
+PQ_CENTROIDS_FILE = "pq_centroids.npy"
+
+RERANK_FACTOR = 10          # shortlist = k * RERANK_FACTOR rows re-scored exactly
+ENCODE_BLOCK_ROWS = 65536
+SCORE_BLOCK_ROWS = 4096     # rows decoded per step at query time (~6 MB at dim 384)
+PQ_TRAIN_POINTS = 20_000
+PQ_LAYOUT = "m_by_n"        # PQ codes stored sub-vector major: one row per sub-vector
+
+
+# ===============================
+# Approximate Scoring + Exact Re-rank
+# ===============================
+class Codec:
+    # Compression buys memory, not speed: scoring int8 codes takes about as
+    # long as an exact float32 matmul held in RAM (at 1/4 of the memory) and
+    # PQ about 2.5x as long (at m bytes per vector). They pay off when the
+    # float32 matrix no longer fits in RAM and exact search goes to disk.
+
+    rerank_factor = RERANK_FACTOR
+
+    def search(self, matrix, queries, k):
+        # Scores every row on the compressed codes, then re-scores a shortlist
+        # against the full-precision (memory-mapped) vectors.
+        approx = self.scores(queries)
+        shortlists = top_k_indices(approx, k * self.rerank_factor)
+
+        results = []
+        for q, rows in zip(queries, shortlists):
+            rows = np.sort(rows)
+            exact = np.asarray(matrix[rows], dtype=np.float32) @ q
+            top = top_k_indices(exact, k)
+            results.append((rows[top], exact[top]))
+        return results
+
+
+# ===============================
+# Scalar int8
+# ===============================
+class Int8Codec(Codec):
+    # Per-dimension symmetric scale: code = round(v / scale * 127)
+
+    kind = "int8"
+
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def build(cls, matrix):
+        scales = np.zeros(matrix.shape[1], dtype=np.float32)
+        for start in range(0, matrix.shape[0], ENCODE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + ENCODE_BLOCK_ROWS], dtype=np.float32)
+            scales = np.maximum(scales, np.abs(block).max(axis=0))
+        scales[scales == 0] = 1.0
+
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for start in range(0, matrix.shape[0], ENCODE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + ENCODE_BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / scales * 127), -127, 127)
+        return cls(codes, scales)
+
+    def scores(self, queries):
+        # Fold the scales into the query once instead of decoding every row;
+        # rows are widened to float32 a small block at a time into one
+        # reused buffer, so the temporary stays a few MB at any index size
+        q = (queries * (self.scales / 127)).astype(np.float32)
+        out = np.empty((q.shape[0], self.codes.shape[0]), dtype=np.float32)
+        buf = np.empty((min(SCORE_BLOCK_ROWS, self.codes.shape[0]), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, self.codes.shape[0], SCORE_BLOCK_ROWS):
+            codes = self.codes[start:start + SCORE_BLOCK_ROWS]
+            block = buf[:len(codes)]
+            np.copyto(block, codes)
+            out[:, start:start + len(codes)] = q @ block.T
+        return out
+
+    def save(self, path):
+        np.save(os.path.join(path, INT8_CODES_FILE), self.codes)
+        np.save(os.path.join(path, INT8_SCALES_FILE), self.scales)
+        return {"type": self.kind, "bytes_per_vector": int(self.codes.shape[1])}
+
+    @classmethod
+    def load(cls, path, info):
+        return cls(
+            np.load(os.path.join(path, INT8_CODES_FILE)),
+            np.load(os.path.join(path, INT8_SCALES_FILE)),
+        )
+
+
+# ===============================
+# Product Quantization
+# ===============================
+def kmeans(data, k, iters=15, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iters):
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        assign = np.argmax(data @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty))]
+
+    return centroids
+
+
+class PQCodec(Codec):
+    # m sub-vectors, each replaced by the id of its nearest of ksub centroids
+
+    kind = "pq"
+
+    def __init__(self, codes, centroids, dim):
+        self.codes = codes            # (m, N) uint8: the layout scoring reads
+        self.centroids = centroids    # (m, ksub, dsub)
+        self.dim = dim
+
+    @property
+    def m(self):
+        return self.centroids.shape[0]
+
+    @staticmethod
+    def split(block, m, dsub):
+        # Zero-pad so dim divides evenly into m sub-vectors
+        pad = m * dsub - block.shape[1]
+        if pad:
+            block = np.hstack([block, np.zeros((block.shape[0], pad), dtype=np.float32)])
+        return block.reshape(block.shape[0], m, dsub)
+
+    @classmethod
+    def build(cls, matrix, m=96, ksub=256, seed=0):
+        n, dim = matrix.shape
+        m = min(m, dim)
+        dsub = -(-dim // m)
+        ksub = min(ksub, n)
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, min(n, PQ_TRAIN_POINTS), replace=False))
+        train = cls.split(np.asarray(matrix[sample], dtype=np.float32), m, dsub)
+
+        centroids = np.stack([kmeans(train[:, j], ksub, seed=seed + j) for j in range(m)])
+
+        codes = np.empty((m, n), dtype=np.uint8)
+        half_norms = 0.5 * (centroids ** 2).sum(axis=2)
+        for start in range(0, n, ENCODE_BLOCK_ROWS):
+            block = cls.split(np.asarray(matrix[start:start + ENCODE_BLOCK_ROWS], dtype=np.float32), m, dsub)
+            for j in range(m):
+                codes[j, start:start + len(block)] = np.argmax(
+                    block[:, j] @ centroids[j].T - half_norms[j], axis=1)
+        return cls(codes, centroids.astype(np.float32), dim)
+
+    def scores(self, queries):
+        # Asymmetric distance: one (m, ksub) lookup table per query, summed
+        # with one gather per sub-vector over contiguous (m, N) codes
+        codes = self.codes
+
+        dsub = self.centroids.shape[2]
+        qs = self.split(np.asarray(queries, dtype=np.float32), self.m, dsub)
+        tables = np.einsum("qmd,mkd->qmk", qs, self.centroids)
+        out = np.zeros((len(queries), codes.shape[1]), dtype=np.float32)
+
+        for start in range(0, codes.shape[1], SCORE_BLOCK_ROWS):
+            acc = out[:, start:start + SCORE_BLOCK_ROWS]
+            for j in range(self.m):
+                acc += tables[:, j][:, codes[j, start:start + SCORE_BLOCK_ROWS]]
+        return out
+
+    def save(self, path):
+        np.save(os.path.join(path, PQ_CODES_FILE), self.codes)
+        np.save(os.path.join(path, PQ_CENTROIDS_FILE), self.centroids)
+        return {"type": self.kind, "m": self.m, "dim": self.dim, "bytes_per_vector": self.m,
+                "layout": PQ_LAYOUT}
+
+    @classmethod
+    def load(cls, path, info):
+        codes_path = os.path.join(path, PQ_CODES_FILE)
+        if info.get("layout") == PQ_LAYOUT:
+            codes = np.load(codes_path)
+        else:
+            # Older (N, m) files: transpose straight off the memory map so
+            # only the (m, N) copy is ever resident
+            codes = np.ascontiguousarray(np.load(codes_path, mmap_mode="r").T)
+        return cls(codes, np.load(os.path.join(path, PQ_CENTROIDS_FILE)), info["dim"])
+
+
+CODECS = {"int8": Int8Codec, "pq": PQCodec}
+
+
+def load_codec(path, meta):
+    info = meta.get("codec")
+    if not info:
+        return None
+    return CODECS[info["type"]].load(path, info)
@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import glob
+import time
+import random
+
+from sqlite_store import SQLiteStore
+
+BANK_FILE = os.path.join(".cache", "question_bank.sqlite")
+REPORTS_DIR = "exam_reports"
+TYPES = ("mcq", "short", "essay")
+
+
+def topic_key(topic):
+    return " ".join(topic.lower().split())
+
+
+def question_key(text):
+    return " ".join(str(text).lower().split())
+
+
+def type_counts(n, mcq_ratio):
+    # Same split as the exam generator: ratio 0 means a single essay
+    if mcq_ratio == 0:
+        return {"essay": 1}
+    n_mcq = round(n * mcq_ratio)
+    return {"mcq": n_mcq, "short": n - n_mcq}
+
+
+# ===============================
+# Question Bank (SQLite)
+# ===============================
+class QuestionBank(SQLiteStore):
+    # Questions indexed by (topic, type, skill, difficulty). Filled from live
+    # or batch generation and by harvesting saved exam reports. Exams are
+    # sampled least-used first, so the exam just taken (stored as used) only
+    # comes back once everything else has been served as often.
+
+    tables = ("questions", "harvested")
+
+    def __init__(self, path=BANK_FILE):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                topic_key TEXT NOT NULL,
+                type TEXT NOT NULL,
+                skill TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                q_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                source TEXT NOT NULL,
+                created REAL NOT NULL,
+                times_used INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (topic_key, q_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_questions_lookup
+            ON questions(topic_key, type, skill, difficulty);
+
+            CREATE TABLE IF NOT EXISTS harvested (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            );
+        """)
+
+    def add(self, topic, questions, source="generated", used=False):
+        # Returns how many were new; repeats of a stored question are ignored.
+        # used=True for questions that were just served in a live exam.
+        now = time.time()
+        rows = []
+        for q in questions:
+            if q.get("type") not in TYPES or not q.get("q") or not isinstance(q.get("answer"), str):
+                continue
+            if q["type"] == "mcq" and not q.get("choices"):
+                continue  # can't be asked again without its choices
+            item = {k: q[k] for k in ("type", "q", "choices", "answer", "skill", "difficulty") if q.get(k)}
+            rows.append((
+                topic, topic_key(topic), q["type"], q.get("skill") or "unknown",
+                q.get("difficulty") or "medium", question_key(q["q"]),
+                json.dumps(item, ensure_ascii=False), source, now, int(used),
+            ))
+
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO questions "
+                "(topic, topic_key, type, skill, difficulty, q_key, question, source, created, times_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def harvest(self, folder=REPORTS_DIR):
+        # Imports questions from exam reports not seen before (or changed
+        # since); returns the number of new questions. Only the newest
+        # report counts as used: it is the exam that was just taken.
+        added = 0
+        paths = sorted(glob.glob(os.path.join(folder, "*.json")))
+        latest = max(paths, key=os.path.getmtime, default=None)
+        for path in paths:
+            mtime = os.path.getmtime(path)
+            with self._lock:
+                row = self._db.execute("SELECT mtime FROM harvested WHERE path = ?", (path,)).fetchone()
+            if row and row[0] >= mtime:
+                continue
+
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            questions = [
+                {"type": r.get("type"), "q": r.get("q"), "choices": r.get("choices"),
+                 "answer": r.get("correct_answer"), "skill": r.get("skill"),
+                 "difficulty": r.get("difficulty")}
+                for r in report.get("results", [])
+            ]
+            added += self.add(report.get("topic", ""), questions, source="report", used=path == latest)
+
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO harvested (path, mtime) VALUES (?, ?)", (path, mtime))
+                self._db.commit()
+        return added
+
+    def count(self, topic, qtype=None, difficulty=None, unused=False):
+        sql = "SELECT COUNT(*) FROM questions WHERE topic_key = ?"
+        args = [topic_key(topic)]
+        if qtype:
+            sql += " AND type = ?"
+            args.append(qtype)
+        if difficulty:
+            sql += " AND difficulty = ?"
+            args.append(difficulty)
+        if unused:
+            sql += " AND times_used = 0"
+        with self._lock:
+            return self._db.execute(sql, args).fetchone()[0]
+
+    def covers(self, topic, n, mcq_ratio, difficulty=None, unused=False):
+        # Enough questions (or unused ones) of every type for one exam
+        return all(self.count(topic, t, difficulty, unused) >= c
+                   for t, c in type_counts(n, mcq_ratio).items())
+
+    def sample(self, topic, n, mcq_ratio, difficulty=None):
+        # An exam dict shaped like generate_exam's, or None when the bank
+        # can't cover the requested mix for this topic
+        if not self.covers(topic, n, mcq_ratio, difficulty):
+            return None
+
+        picked = []
+        with self._lock:
+            for qtype, wanted in type_counts(n, mcq_ratio).items():
+                sql = "SELECT id, skill, question, times_used FROM questions WHERE topic_key = ? AND type = ?"
+                args = [topic_key(topic), qtype]
+                if difficulty:
+                    sql += " AND difficulty = ?"
+                    args.append(difficulty)
+                rows = self._db.execute(sql + " ORDER BY times_used, RANDOM()", args).fetchall()
+
+                # Least-used tier first; within a tier, round-robin over
+                # skills for a balanced exam
+                chosen = []
+                tiers = {}
+                for row in rows:
+                    tiers.setdefault(row[3], {}).setdefault(row[1], []).append(row)
+                for used in sorted(tiers):
+                    queues = list(tiers[used].values())
+                    random.shuffle(queues)
+                    while len(chosen) < wanted and any(queues):
+                        for queue in queues:
+                            if queue and len(chosen) < wanted:
+                                chosen.append(queue.pop(0))
+                picked.extend(chosen)
+
+            self._db.executemany("UPDATE questions SET times_used = times_used + 1 WHERE id = ?",
+                                 [(row[0],) for row in picked])
+            self._db.commit()
+
+        return {"topic": topic, "questions": [json.loads(row[2]) for row in picked]}
+
+    def topics(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT MIN(topic), type, COUNT(*), SUM(times_used = 0) FROM questions "
+                "GROUP BY topic_key, type ORDER BY topic_key, type"
+            ).fetchall()
+
+
+def fill(bank, topic, n=20, mcq_ratio=0.5, rounds=1):
+    # Batch generation into the bank (uses the day 8 sharded generator)
+    from day8_exam_simulator import generate_exam
+
+    added = 0
+    for _ in range(rounds):
+        exam, _raw = generate_exam(topic, n, mcq_ratio)
+        added += bank.add(topic, exam.get("questions", []))
+    return added
+
+
+if __name__ == "__main__":
+    # python question_bank.py stats
+    # python question_bank.py harvest [reports_dir]
+    # python question_bank.py fill "<topic>" [n] [mcq_ratio] [rounds]
+    # python question_bank.py clear
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    bank = QuestionBank()
+
+    if cmd == "harvest":
+        added = bank.harvest(sys.argv[2] if len(sys.argv) > 2 else REPORTS_DIR)
+        print(f"✅ Harvested {added} new questions ({len(bank)} in bank)")
+
+    elif cmd == "fill" and len(sys.argv) > 2:
+        n = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        ratio = float(sys.argv[4]) if len(sys.argv) > 4 else 0.5
+        rounds = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        added = fill(bank, sys.argv[2], n, ratio, rounds)
+        print(f"✅ Added {added} questions on '{sys.argv[2]}' ({len(bank)} in bank)")
+
+    elif cmd == "clear":
+        bank.clear()
+        print("Question bank cleared ✅")
+
+    elif cmd == "stats":
+        print(f"📚 {bank.path}: {len(bank)} questions")
+        for topic, qtype, total, unused in bank.topics():
+            print(f"- {topic} [{qtype}]: {total} ({unused} unused)")
+
+    else:
+        print("Usage: python question_bank.py [stats|harvest [dir]|fill <topic> [n] [ratio] [rounds]|clear]")
+        sys.exit(1)
@@ -0,0 +1,491 @@
+import io
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import platform
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+
+import day9_rag_engine as rag
+from index_store import open_index_dir
+from bm25_index import tokenize
+from llm_client import LLMClient, FakeBackend, RateLimiter, set_client
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DIM = 384                          # fake embedding width
+K = 10
+QUERIES = 200                      # single-query calls timed per engine
+QUERY_WORDS = 8                    # words lifted from a chunk to form a question
+WARMUP_QUERIES = 5
+JSON_MAX_CHUNKS = 50_000           # the legacy JSON index gets too big beyond this
+
+TOPICS = 64
+TOPIC_WORDS = 300
+COMMON_WORDS = 2000
+TOPIC_SHARE = 0.7                  # fraction of a document's words from its topic
+DOC_CHUNKS = 20                    # synthetic document length, in chunks
+
+DEFAULT_SIZES = [1_000, 10_000]
+ENGINES = ["json", "exact", "float16", "ivf", "int8", "pq", "bm25", "hybrid"]
+
+# Each engine is day9_rag_engine run with these settings; everything else
+# (chunking, nprobe, PQ_M, rerank, hybrid depth) keeps day9's own values
+BASE_SETTINGS = {"INDEX_DTYPE": "float32", "ANN_TYPE": None, "VECTOR_CODEC": None, "RETRIEVAL_MODE": "vector"}
+ENGINE_SETTINGS = {
+    "json": {},
+    "exact": {},
+    "float16": {"INDEX_DTYPE": "float16"},
+    "ivf": {"ANN_TYPE": "ivf"},
+    "int8": {"VECTOR_CODEC": "int8"},
+    "pq": {"VECTOR_CODEC": "pq"},
+    "bm25": {"RETRIEVAL_MODE": "lexical"},
+    "hybrid": {"RETRIEVAL_MODE": "hybrid"},
+}
+RESULTS_FILE = "rag_benchmark.json"
+
+# Relative slowdown (or size growth) that `compare` reports as a regression
+TOLERANCE = 0.20
+RECALL_TOLERANCE = 0.01
+LOWER_IS_BETTER = ["build_s", "load_s", "p50_ms", "p95_ms", "p99_ms", "ram_bytes", "disk_bytes"]
+HIGHER_IS_BETTER = ["recall", "hit_rate"]
+
+
+# ===============================
+# Synthetic Corpus
+# ===============================
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "pe", "da",
+             "zu", "ri", "mo", "fa", "ge", "bo", "xi", "ly", "qu", "en"]
+
+
+def make_vocab(size, seed=0):
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        n = int(rng.integers(2, 5))
+        words.add("".join(SYLLABLES[i] for i in rng.integers(0, len(SYLLABLES), n)))
+    return np.array(sorted(words))
+
+
+def zipf_weights(n, s=1.1):
+    w = 1.0 / np.arange(1, n + 1) ** s
+    return w / w.sum()
+
+
+def iter_documents(seed=0):
+    # Endless deterministic documents: each mixes one topic's vocabulary with
+    # shared common words, so both BM25 and the fake embeddings see structure.
+    vocab = make_vocab(COMMON_WORDS + TOPICS * TOPIC_WORDS, seed)
+    common = vocab[:COMMON_WORDS]
+    topics = vocab[COMMON_WORDS:].reshape(TOPICS, TOPIC_WORDS)
+    common_p = zipf_weights(COMMON_WORDS)
+    topic_p = zipf_weights(TOPIC_WORDS)
+    words_per_doc = DOC_CHUNKS * (rag.CHUNK_SIZE - rag.CHUNK_OVERLAP) // 8
+
+    doc = 0
+    while True:
+        rng = np.random.default_rng([seed, doc])
+        topic = topics[rng.integers(TOPICS)]
+        from_topic = rng.random(words_per_doc) < TOPIC_SHARE
+        words = np.where(
+            from_topic,
+            topic[rng.choice(TOPIC_WORDS, words_per_doc, p=topic_p)],
+            common[rng.choice(COMMON_WORDS, words_per_doc, p=common_p)],
+        )
+        yield " ".join(words.tolist())
+        doc += 1
+
+
+# ===============================
+# Deterministic Fake Embedder
+# ===============================
+class FakeEmbedder(FakeBackend):
+    # FakeBackend with bag-of-words embeddings: every word maps to a fixed
+    # random vector (seeded by its crc32), a text is the sum of its words.
+    # Same text -> same vector on every run, and texts sharing words land
+    # close together, so recall and hit rate mean something offline.
+
+    def __init__(self, dim=DIM, seed=0):
+        super().__init__(dim=dim)
+        self.seed = seed
+        self.vocab = {}
+        self.table = np.zeros((0, dim), dtype=np.float32)
+        self._lock = threading.Lock()   # the embedding pipeline calls from several threads
+
+    def word_vector(self, word):
+        rng = np.random.default_rng([self.seed, zlib.crc32(word.encode("utf-8"))])
+        return rng.standard_normal(self.dim).astype(np.float32)
+
+    def rows(self, words, new):
+        rows = []
+        for w in words:
+            r = self.vocab.get(w)
+            if r is None:
+                r = self.vocab[w] = len(self.vocab)
+                new.append(w)
+            rows.append(r)
+        return rows
+
+    def vectors(self, texts):
+        with self._lock:
+            new = []
+            rows = [self.rows(tokenize(t), new) for t in texts]
+            if new:
+                self.table = np.vstack([self.table, np.stack([self.word_vector(w) for w in new])])
+            table = self.table
+
+        out = np.zeros((len(rows), self.dim), dtype=np.float32)
+        filled = [i for i, r in enumerate(rows) if r]
+        if filled:
+            flat = np.fromiter((x for i in filled for x in rows[i]), dtype=np.int64)
+            starts = np.cumsum([0] + [len(rows[i]) for i in filled[:-1]])
+            out[filled] = np.add.reduceat(table[flat], starts, axis=0)
+        return out, sum(len(r) for r in rows)
+
+    def embed(self, model="text-embedding-3-small", input=(), **params):
+        self.calls += 1
+        texts = [input] if isinstance(input, str) else list(input)
+        vecs, words = self.vectors(texts)
+        data = [SimpleNamespace(index=i, embedding=v.tolist()) for i, v in enumerate(vecs)]
+        usage = SimpleNamespace(prompt_tokens=words, total_tokens=words)
+        return SimpleNamespace(model=model, data=data, usage=usage)
+
+
+def use_fake_pipeline(dim=DIM):
+    # day9 runs unchanged on a fake backend: no network, no rate limits,
+    # and no embedding cache so every run embeds (and times) the same work
+    rag.client = set_client(LLMClient(FakeEmbedder(dim), limiter=RateLimiter(0, 0), response_cache=None))
+    rag.embed_cache = None
+
+
+def configure(name):
+    for setting, value in dict(BASE_SETTINGS, **ENGINE_SETTINGS[name]).items():
+        setattr(rag, setting, value)
+
+
+def quiet(fn, *args, **kwargs):
+    # day9's progress messages would drown the benchmark table
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+# ===============================
+# Measurement Helpers
+# ===============================
+def peak_rss_mb():
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def disk_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def resident_bytes(obj, depth=0):
+    # Heap held by an engine; memory-mapped arrays only cost page cache
+    if isinstance(obj, np.memmap):
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (str, bytes, int, float)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(resident_bytes(k, depth) + resident_bytes(v, depth) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(resident_bytes(x, depth) for x in obj)
+    if depth < 2 and hasattr(obj, "__dict__"):
+        return sum(resident_bytes(v, depth + 1) for v in vars(obj).values())
+    return 0
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def clone_dir(src, dst):
+    # Hard-link the big immutable files; meta.json is rewritten by side
+    # indexes (atomically, via replace) so each clone gets its own copy.
+    os.makedirs(dst)
+    for name in os.listdir(src):
+        s, d = os.path.join(src, name), os.path.join(dst, name)
+        if name == "meta.json":
+            shutil.copy2(s, d)
+            continue
+        try:
+            os.link(s, d)
+        except OSError:
+            shutil.copy2(s, d)
+
+
+# ===============================
+# Build Stages
+# ===============================
+def make_chunks(n_chunks, seed=0):
+    # day9's chunk_text over synthetic documents until n_chunks are made
+    chunks = []
+    for doc in iter_documents(seed):
+        chunks.extend(rag.chunk_text(doc)[:n_chunks - len(chunks)])
+        if len(chunks) >= n_chunks:
+            return chunks
+
+
+def build_base(path, n_chunks, seed=0):
+    # chunk_text -> build_index (embed + write + BM25); returns the chunks
+    # and stage timings
+    configure("exact")
+    start = time.perf_counter()
+    chunks = make_chunks(n_chunks, seed)
+    chunk_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    quiet(rag.build_index, chunks, path)
+    return chunks, {"chunk_s": round(chunk_s, 3), "index_s": round(time.perf_counter() - start, 3)}
+
+
+def build_engine(name, base, work, chunks):
+    # Returns (path, seconds): whatever day9 builds for this engine's
+    # settings on top of the shared float32 base index
+    path = os.path.join(work, name)
+    configure(name)
+    start = time.perf_counter()
+
+    if name in ("exact", "bm25", "hybrid"):
+        return base, 0.0   # the base index already carries BM25
+
+    if name == "json":
+        # The legacy format day9 still loads (it no longer writes it)
+        engine = open_index_dir(base)
+        path += ".json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([
+                {"id": engine.ids[i], "text": engine.texts[i], "vec": engine.matrix[i].tolist()}
+                for i in range(len(engine))
+            ], f)
+        del engine
+
+    elif name == "float16":
+        quiet(rag.build_index, chunks, path)
+
+    else:
+        clone_dir(base, path)
+        quiet(rag.ensure_side_indexes, open_index_dir(path), path)
+
+    return path, time.perf_counter() - start
+
+
+def load_engine(name, path):
+    # day9's load_index (+ side indexes) pointed at this engine's files
+    configure(name)
+    if name == "json":
+        rag.INDEX_DIR, rag.INDEX_FILE = path + ".missing", path
+    else:
+        rag.INDEX_DIR = path
+
+    start = time.perf_counter()
+    engine = quiet(rag.load_index)
+    if name != "json":
+        engine = quiet(rag.ensure_side_indexes, engine, path)
+    return engine, time.perf_counter() - start
+
+
+# ===============================
+# Queries
+# ===============================
+def make_queries(engine, n=QUERIES, seed=0):
+    # Questions are runs of words lifted from random chunks; the chunk they
+    # came from is the "relevant" one for hit rate.
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(engine), min(n, len(engine)), replace=False)
+    sources, texts = [], []
+    for row in rows:
+        words = tokenize(engine.texts[int(row)])
+        start = int(rng.integers(0, max(len(words) - QUERY_WORDS, 0) + 1))
+        sources.append(engine.ids[int(row)])
+        texts.append(" ".join(words[start:start + QUERY_WORDS]))
+    return sources, texts
+
+
+def result_ids(results):
+    return {cid for _score, cid, _text in results}
+
+
+def measure_queries(engine, texts, truth, sources, k=K):
+    # One day9 retrieve_top_k call per question: fake embedding + search
+    for text in texts[:WARMUP_QUERIES]:
+        rag.retrieve_top_k(engine, text, k=k)
+
+    samples, found, hits = [], 0, 0
+    for text, exact, source in zip(texts, truth, sources):
+        start = time.perf_counter()
+        results = rag.retrieve_top_k(engine, text, k=k)
+        samples.append(time.perf_counter() - start)
+
+        ids = result_ids(results)
+        found += len(ids & exact)
+        hits += source in ids
+
+    total = sum(len(t) for t in truth)
+    report = percentiles(samples)
+    report["recall"] = round(found / total, 4) if total else 1.0
+    report["hit_rate"] = round(hits / len(texts), 4) if texts else 1.0
+    return report
+
+
+# ===============================
+# Benchmark Runner
+# ===============================
+def bench_size(n_chunks, engines, work, k=K):
+    use_fake_pipeline()
+    base = os.path.join(work, "base")
+
+    print(f"\n📦 {n_chunks:,} chunks")
+    chunks, stages = build_base(base, n_chunks)
+    print(f"- chunk {stages['chunk_s']}s · fake embed + write + BM25 {stages['index_s']}s")
+
+    exact, _ = load_engine("exact", base)
+    sources, texts = make_queries(exact)
+    truth = [result_ids(r) for r in rag.retrieve_top_k_batch(exact, texts, k=k)]
+    del exact
+
+    results = []
+    for name in engines:
+        if name == "json" and n_chunks > JSON_MAX_CHUNKS:
+            print(f"- {name:<8} skipped (> {JSON_MAX_CHUNKS:,} chunks)")
+            continue
+
+        path, build_s = build_engine(name, base, work, chunks)
+        engine, load_s = load_engine(name, path)
+
+        row = {
+            "size": n_chunks,
+            "engine": name,
+            "chunks": len(engine),
+            "dim": engine.dim,
+            "build_s": round(build_s if name == "float16" else stages["index_s"] + build_s, 3),
+            "load_s": round(load_s, 4),
+            "disk_bytes": disk_bytes(path),
+            "ram_bytes": resident_bytes(engine),
+        }
+        row.update(measure_queries(engine, texts, truth, sources, k))
+        row["peak_rss_mb"] = peak_rss_mb()
+        row.update({f"base_{s}": v for s, v in stages.items()})
+        results.append(row)
+
+        print(f"- {name:<8} build {row['build_s']:>8.3f}s  load {row['load_s']:>7.4f}s  "
+              f"p50 {row['p50_ms']:>7.3f}  p95 {row['p95_ms']:>7.3f}  p99 {row['p99_ms']:>7.3f} ms  "
+              f"recall@{k} {row['recall']:.3f}  hit {row['hit_rate']:.3f}  "
+              f"ram {row['ram_bytes'] / 1e6:.1f} MB  disk {row['disk_bytes'] / 1e6:.1f} MB")
+
+        # Windows cannot delete files that are still memory-mapped
+        del engine
+        if path != base:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    shutil.rmtree(base, ignore_errors=True)
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, engines=ENGINES, out_path=RESULTS_FILE):
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        raise ValueError(f"Unknown engines: {sorted(unknown)} (choose from {ENGINES})")
+
+    work = tempfile.mkdtemp(prefix="rag_bench_")
+    try:
+        results = [row for n in sizes for row in bench_size(n, engines, work)]
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "config": {
+            "dim": DIM, "k": K, "queries": QUERIES, "chunk_size": rag.CHUNK_SIZE,
+            "chunk_overlap": rag.CHUNK_OVERLAP, "nprobe": rag.ANN_NPROBE, "pq_m": rag.PQ_M,
+            "rerank_factor": rag.RERANK_FACTOR, "hybrid_depth": rag.HYBRID_DEPTH,
+        },
+        "results": results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {out_path} ✅")
+    return report
+
+
+# ===============================
+# Regression Check
+# ===============================
+def compare(baseline, current, tolerance=TOLERANCE):
+    # Returns a list of human-readable regressions (empty = all good)
+    base = {(r["size"], r["engine"]): r for r in baseline["results"]}
+    regressions = []
+
+    for row in current["results"]:
+        old = base.get((row["size"], row["engine"]))
+        if old is None:
+            continue
+        label = f"{row['engine']}@{row['size']:,}"
+
+        for key in LOWER_IS_BETTER:
+            if old.get(key) and row.get(key) is not None and row[key] > old[key] * (1 + tolerance):
+                regressions.append(f"{label}: {key} {old[key]} -> {row[key]} (+{row[key] / old[key] - 1:.0%})")
+        for key in HIGHER_IS_BETTER:
+            if key in old and key in row and row[key] < old[key] - RECALL_TOLERANCE:
+                regressions.append(f"{label}: {key} {old[key]} -> {row[key]}")
+
+    return regressions
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    # python rag_benchmark.py run [1000,10000,...] [exact,ivf,...] [out.json]
+    # python rag_benchmark.py compare <baseline.json> <current.json> [tolerance]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "run"
+
+    if cmd == "run":
+        sizes = [int(s) for s in sys.argv[2].split(",")] if len(sys.argv) > 2 else DEFAULT_SIZES
+        engines = sys.argv[3].split(",") if len(sys.argv) > 3 else ENGINES
+        out_path = sys.argv[4] if len(sys.argv) > 4 else RESULTS_FILE
+        run(sizes, engines, out_path)
+
+    elif cmd == "compare" and len(sys.argv) > 3:
+        tolerance = float(sys.argv[4]) if len(sys.argv) > 4 else TOLERANCE
+        found = compare(load_results(sys.argv[2]), load_results(sys.argv[3]), tolerance)
+        for line in found:
+            print(f"⚠️ {line}")
+        print("No regressions ✅" if not found else f"{len(found)} regression(s) ❌")
+        sys.exit(1 if found else 0)
+
+    else:
+        print("Usage: python rag_benchmark.py run [sizes] [engines] [out.json]")
+        print("       python rag_benchmark.py compare <baseline.json> <current.json> [tolerance]")
+        sys.exit(1)
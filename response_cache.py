@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from types import SimpleNamespace
+
+from llm_metrics import metrics
+from sqlite_store import SQLiteStore
+
+CACHE_FILE = os.path.join(".cache", "responses.sqlite")
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.0"))   # explicitly hotter requests bypass
+KEY_EXCLUDED = ("stream", "user")              # don't change the completion
+
+
+def cacheable(request, max_temperature=MAX_TEMPERATURE):
+    # Turning the cache on (LLM_RESPONSE_CACHE) is consent to replay
+    # requests that leave temperature at the API default, which is what
+    # every ask_ai wrapper sends. Streams, multi-sample requests and an
+    # explicit temperature above the threshold always go out.
+    if request.get("stream") or (request.get("n") or 1) > 1:
+        return False
+    temperature = request.get("temperature")
+    return temperature is None or temperature <= max_temperature
+
+
+def request_key(request):
+    # Model, messages and every sampling parameter, in a stable form
+    params = {k: v for k, v in request.items() if k not in KEY_EXCLUDED}
+    blob = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ===============================
+# Response Cache (SQLite)
+# ===============================
+class ResponseCache(SQLiteStore):
+    # Exact-match chat completion cache shared by every script through
+    # llm_client. Entries expire after ttl; the least recently used go
+    # first once there are more than max_entries.
+
+    tables = ("responses",)
+
+    def __init__(self, path=CACHE_FILE, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES,
+                 max_temperature=MAX_TEMPERATURE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+
+        super().__init__(path, """
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT NOT NULL,
+                finish_reason TEXT,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_used ON responses(last_used);
+        """)
+
+    def get(self, request):
+        # A response shaped like the SDK's, or None
+        key = request_key(request)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT model, content, finish_reason, prompt_tokens, completion_tokens FROM responses "
+                "WHERE key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row:
+                self._db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                self._db.commit()
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.record_cache("responses", hits=int(row is not None), misses=int(row is None))
+        if row is None:
+            return None
+
+        model, content, finish_reason, prompt_tokens, completion_tokens = row
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(model=model, usage=usage, cached=True,
+                               choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)])
+
+    def put(self, request, resp, seconds):
+        choice = resp.choices[0]
+        if choice.message.content is None:
+            return  # e.g. tool calls: nothing to replay
+        usage = getattr(resp, "usage", None)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, finish_reason, prompt_tokens, "
+                "completion_tokens, seconds, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request_key(request), getattr(resp, "model", request.get("model")), choice.message.content,
+                 getattr(choice, "finish_reason", None), getattr(usage, "prompt_tokens", 0) or 0,
+                 getattr(usage, "completion_tokens", 0) or 0, seconds, now, now),
+            )
+            self._evict(self.max_entries, self.ttl, now)
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, hits, saved_s, saved_tokens = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * seconds), 0), "
+                "COALESCE(SUM(hits * (prompt_tokens + completion_tokens)), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "hits": hits,              # all time, over the entries still stored
+            "seconds_saved": saved_s,
+            "tokens_saved": saved_tokens,
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+if __name__ == "__main__":
+    # python response_cache.py [stats|clear]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = ResponseCache()
+
+    if cmd == "clear":
+        cache.clear()
+        print("Response cache cleared ✅")
+    else:
+        s = cache.stats()
+        print(f"💾 {cache.path}: {s['entries']} cached responses ({s['bytes'] / 1024:.0f} KiB)")
+        print(f"- {s['hits']} hits · {s['seconds_saved']:.1f} s and {s['tokens_saved']:,} tokens saved")
+        print(f"- TTL {cache.ttl / 3600:.0f} h · max {cache.max_entries} entries")
+        print(f"- Replays requests with no temperature or temperature <= {cache.max_temperature}; "
+              "streams, n > 1 and hotter requests always go to the API")
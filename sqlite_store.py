@@ -0,0 +1,58 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+# ===============================
+# SQLite Store (shared plumbing)
+# ===============================
+class SQLiteStore:
+    # Base for the .cache/*.sqlite caches and stores: one connection shared
+    # by all threads behind a lock, WAL so reads don't block the writer.
+    # Subclasses pass their schema and name their tables; the first table
+    # is the one __len__ counts and _evict trims.
+
+    tables = ()
+    key_column = "key"   # column _evict deletes by
+
+    def __init__(self, path, schema):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(schema)
+        self._db.commit()
+
+    def _evict(self, max_entries, ttl=None, now=None):
+        # Call with the lock held, before committing a write: drops rows
+        # created more than ttl ago, then the least recently used ones past
+        # max_entries
+        table = self.tables[0]
+        if ttl is not None:
+            now = time.time() if now is None else now
+            self._db.execute(f"DELETE FROM {table} WHERE created < ?", (now - ttl,))
+        count = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if count > max_entries:
+            self._db.execute(
+                f"DELETE FROM {table} WHERE {self.key_column} IN "
+                f"(SELECT {self.key_column} FROM {table} ORDER BY last_used ASC LIMIT ?)",
+                (count - max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            for table in self.tables:
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.tables[0]}").fetchone()[0]
+
+    def close(self):
+        self._db.close()
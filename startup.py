@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import time
+import queue
+import threading
+import importlib
+import subprocess
+from concurrent.futures import Future
+
+PROMPT_RE = re.compile(r"[:?>] ?$")      # output that ends like an input() prompt
+PROMPT_TIMEOUT = 30.0
+PROMPT_SETTLE = 0.2                       # quiet time that confirms the prompt
+
+
+# ===============================
+# Lazy Objects + Background Work
+# ===============================
+class LazyObject:
+    # Stands in for module.attr(*args, **kwargs); the module is imported and
+    # the object built on first attribute access.
+
+    def __init__(self, module, attr, *args, **kwargs):
+        self._spec = (module, attr, args, kwargs)
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    module, attr, args, kwargs = self._spec
+                    self._obj = getattr(importlib.import_module(module), attr)(*args, **kwargs)
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __len__(self):
+        return len(self._get())
+
+
+def run_in_background(fn, *args, **kwargs):
+    # Daemon thread (exiting the CLI never waits on it); returns a Future
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as err:
+            future.set_exception(err)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+# ===============================
+# Profiling
+# ===============================
+def import_profile(module):
+    # Runs `python -X importtime -c "import <module>"` in a clean interpreter.
+    # Returns (total_seconds, [(cumulative_s, self_s, name), ...] by cumulative).
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        rows.append((int(cum_us) / 1e6, int(self_us) / 1e6, name[1:].rstrip()))  # keep nesting indent
+
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    top_level = [r for r in rows if not r[2].startswith(" ")]
+    total = sum(r[0] for r in top_level)
+    return total, sorted(rows, reverse=True)
+
+
+def time_to_prompt(script, timeout=PROMPT_TIMEOUT, settle=PROMPT_SETTLE):
+    # Seconds from launching `python <script>` until its output first ends
+    # like an input() prompt; the process is killed right after. A line that
+    # merely ends in ":" is ruled out when its newline follows within `settle`.
+    # Returns (seconds or None, output).
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-u", script],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    chunks = queue.Queue()
+
+    def read():
+        while True:
+            data = os.read(proc.stdout.fileno(), 4096)
+            chunks.put((time.perf_counter(), data))
+            if not data:
+                break
+
+    threading.Thread(target=read, daemon=True).start()
+
+    out = ""
+    seen_at = None
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                at, data = chunks.get(timeout=settle if seen_at else timeout)
+            except queue.Empty:
+                break  # prompt printed and nothing followed
+            if not data:
+                break  # exited (a prompt seen just before still counts)
+            if seen_at is not None and not data.startswith(b"\n"):
+                break  # e.g. background output printed after the prompt
+            out += data.decode("utf-8", "replace")
+            seen_at = at - start if PROMPT_RE.search(out) else None
+    finally:
+        proc.kill()
+        proc.wait()
+    return seen_at, out
+
+
+if __name__ == "__main__":
+    # python startup.py profile <module> [top_n]
+    # python startup.py prompt <script.py> [runs]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+
+    if cmd == "profile" and len(sys.argv) > 2:
+        top_n = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        total, rows = import_profile(sys.argv[2])
+        print(f"⏱️ import {sys.argv[2]}: {total * 1000:.0f} ms")
+        print(f"{'cumulative':>11} {'self':>8}  module")
+        for cum, self_s, name in rows[:top_n]:
+            print(f"{cum * 1000:>9.1f}ms {self_s * 1000:>6.1f}ms  {name}")
+
+    elif cmd == "prompt" and len(sys.argv) > 2:
+        runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+        times = []
+        for _ in range(runs):
+            seconds, output = time_to_prompt(sys.argv[2])
+            if seconds is None:
+                print("❌ No prompt seen. Output was:\n" + output[-500:])
+                sys.exit(1)
+            times.append(seconds)
+        times.sort()
+        print(f"⏱️ time to prompt for {sys.argv[2]}: best {times[0] * 1000:.0f} ms · "
+              f"median {times[len(times) // 2] * 1000:.0f} ms over {runs} runs")
+
+    else:
+        print("Usage: python startup.py profile <module> [top_n]")
+        print("       python startup.py prompt <script.py> [runs]")
+        sys.exit(1)
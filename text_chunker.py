@@ -0,0 +1,136 @@
+import re
+
+from token_count import count_tokens
+
+READ_SIZE = 1 << 20          # characters read from disk per step
+CHARS_PER_TOKEN_MAX = 8      # look-ahead when sizing chunks in tokens
+
+BOUNDARY_PATTERNS = {
+    "paragraph": re.compile(r"\n\s*\n"),
+    "sentence": re.compile(r"\n\s*\n|(?<=[.!?])[\"')\]]*\s+"),
+}
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+# ===============================
+# Sizing Helpers
+# ===============================
+def fit_tokens(text, max_tokens, model=None):
+    # Longest prefix of text with at most max_tokens tokens
+    if count_tokens(text, model) <= max_tokens:
+        return len(text)
+
+    lo, hi = 1, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid], model) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def suffix_tokens(text, max_tokens, model=None):
+    # Length of the longest suffix of text with at most max_tokens tokens
+    if max_tokens <= 0:
+        return 0
+    return fit_tokens(text[::-1], max_tokens, model)
+
+
+def snap_end(window, end, boundary):
+    # Move end back to the last boundary in the second half of the chunk
+    pattern = BOUNDARY_PATTERNS[boundary]
+    best = None
+    for m in pattern.finditer(window, end // 2, end):
+        best = m.end()
+
+    if best is None:
+        for m in WHITESPACE_RE.finditer(window, end // 2, end):
+            best = m.end()
+
+    return best or end
+
+
+# ===============================
+# Streaming Chunker
+# ===============================
+def iter_chunks(pieces, chunk_size=800, overlap=100, boundary=None, unit="chars", model=None):
+    # Yields (char_offset, chunk) from an iterable of text pieces, keeping
+    # only about one chunk of look-ahead in memory.
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    if boundary is not None and boundary not in BOUNDARY_PATTERNS:
+        raise ValueError(f"boundary must be one of {sorted(BOUNDARY_PATTERNS)} or None")
+    if unit not in ("chars", "tokens"):
+        raise ValueError("unit must be 'chars' or 'tokens'")
+
+    # Fixed character windows: identical to the original chunk_text
+    fixed = boundary is None and unit == "chars"
+    need = chunk_size if unit == "chars" else chunk_size * CHARS_PER_TOKEN_MAX
+
+    pieces = iter(pieces)
+    exhausted = False
+    buf = ""
+    buf_start = 0
+    start = 0
+
+    while True:
+        rel = start - buf_start
+        while not exhausted and len(buf) - rel < need:
+            piece = next(pieces, None)
+            if piece is None:
+                exhausted = True
+            else:
+                buf += piece
+
+        if rel >= len(buf):
+            break
+
+        window = buf[rel:rel + need]
+        at_eof = exhausted and rel + len(window) >= len(buf)
+
+        if unit == "tokens":
+            end = fit_tokens(window, chunk_size, model)
+        else:
+            end = len(window)
+
+        if boundary is not None and not (at_eof and end == len(window)):
+            end = snap_end(window, end, boundary)
+
+        chunk = window[:end]
+        yield start, chunk
+
+        if fixed:
+            start += chunk_size - overlap
+        else:
+            if at_eof and end == len(window):
+                break
+
+            back = overlap if unit == "chars" else suffix_tokens(chunk, overlap, model)
+            next_start = end - back
+
+            # Start the next chunk on a word, not mid-word
+            if boundary is not None and back:
+                m = WHITESPACE_RE.search(window, next_start, end)
+                if m:
+                    next_start = m.end()
+
+            start += max(next_start, 1)
+
+        # Drop text that no future chunk can reach
+        if start - buf_start > READ_SIZE:
+            buf = buf[start - buf_start:]
+            buf_start = start
+
+
+def iter_file_pieces(path, read_size=READ_SIZE):
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            piece = f.read(read_size)
+            if not piece:
+                break
+            yield piece
+
+
+def iter_file_chunks(path, chunk_size=800, overlap=100, boundary=None, unit="chars", model=None):
+    return iter_chunks(iter_file_pieces(path), chunk_size, overlap, boundary, unit, model)
@@ -0,0 +1,51 @@
+import re
+
+DEFAULT_ENCODING = "cl100k_base"
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_encoders = {}
+_tiktoken = False     # not imported yet; None once the import has failed
+
+
+def load_tiktoken():
+    # Optional and slow to import, so it is only loaded on the first count
+    global _tiktoken
+    if _tiktoken is False:
+        try:
+            import tiktoken
+            _tiktoken = tiktoken
+        except ImportError:  # optional: fall back to a local estimate
+            _tiktoken = None
+    return _tiktoken
+
+
+def get_encoder(model=None):
+    tiktoken = load_tiktoken()
+    if tiktoken is None:
+        return None
+
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model) if model else \
+                tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding(DEFAULT_ENCODING)
+        except Exception:
+            # e.g. the BPE file cannot be downloaded offline
+            _encoders[model] = None
+
+    return _encoders[model]
+
+
+def count_tokens(text: str, model=None) -> int:
+    enc = get_encoder(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+
+    # Estimate: ~4 characters per token, never fewer than words + punctuation
+    return max(len(_WORD_RE.findall(text)), (len(text) + 3) // 4)
+
+
+def count_message_tokens(messages, model=None) -> int:
+    # ~4 tokens of framing per chat message, +2 for the reply primer
+    return sum(4 + count_tokens(m["content"] or "", model) for m in messages) + 2
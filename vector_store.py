@@ -0,0 +1,107 @@
+import numpy as np
+
+SCORE_BLOCK_ROWS = 65536
+
+
+# ===============================
+# Vector Math Helpers
+# ===============================
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores, k):
+    # argpartition is O(n); only the k winners get fully sorted
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+# ===============================
+# Vector Index
+# ===============================
+class VectorIndex:
+
+    def __init__(self, matrix, ids, texts, normalized=False, meta=None, ann=None):
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+        self.ids = list(ids)
+        self.texts = texts
+        self.meta = meta or {}
+        self.ann = ann  # optional approximate index, e.g. ann_index.IVFIndex
+        self.sources = None  # optional index_store.ChunkSources
+        self.bm25 = None  # optional bm25_index.BM25Index over the same rows
+        self.codec = None  # optional quantization codec (int8 / PQ) + re-rank
+
+        if len(self.ids) != self.matrix.shape[0]:
+            raise ValueError("ids and matrix rows must have the same length")
+
+    @classmethod
+    def from_entries(cls, entries):
+        if not entries:
+            return cls(np.zeros((0, 0), dtype=np.float32), [], [])
+
+        matrix = np.array([e["vec"] for e in entries], dtype=np.float32)
+        ids = [e["id"] for e in entries]
+        texts = [e["text"] for e in entries]
+        return cls(matrix, ids, texts)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    def scores(self, query_vecs):
+        queries = normalize_rows(np.atleast_2d(query_vecs))
+        if self.matrix.dtype == np.float32:
+            return queries @ self.matrix.T
+
+        # float16 storage: upcast block by block to keep memory bounded
+        out = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            out[:, start:start + len(block)] = queries @ block.T
+        return out
+
+    def entry(self, row, score):
+        return (float(score), self.ids[row], self.texts[row])
+
+    def search(self, query_vec, k=3):
+        return self.search_batch([query_vec], k=k)[0]
+
+    def search_rows(self, query_vecs, k=3, exact=False, nprobe=None):
+        # Returns one (rows, scores) pair per query, best first
+        if len(self) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return [(empty, empty.astype(np.float32)) for _ in range(len(query_vecs))]
+
+        if self.ann is not None and not exact:
+            queries = normalize_rows(np.atleast_2d(query_vecs))
+            return self.ann.search(self.matrix, queries, k, nprobe=nprobe)
+
+        if self.codec is not None and not exact:
+            return self.codec.search(self.matrix, normalize_rows(np.atleast_2d(query_vecs)), k)
+
+        scores = self.scores(query_vecs)
+        top = top_k_indices(scores, k)
+        return [(row_top, row_scores[row_top]) for row_scores, row_top in zip(scores, top)]
+
+    def search_batch(self, query_vecs, k=3, exact=False, nprobe=None):
+        return [
+            [self.entry(i, s) for i, s in zip(rows, scores)]
+            for rows, scores in self.search_rows(query_vecs, k, exact=exact, nprobe=nprobe)
+        ]